@@ -4,19 +4,32 @@ algorithms.py should contain the search algorithms and strategies we'll implemen
 These algorithms will determine the next move of current player based on current board.
 """
 import Othello
-import random
+import Bitboard
+import Transposition
+import math
+import os
+import time
+from array import array
+from random import Random, randint
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
 
 
 def random(game):
     """
-    Randomly make a possible move. No strategy is used.
+    Randomly make a possible move, or pass if there is none. No strategy is used.
     :param game: A Othello instance which represent the current game. (board, player, etc.)
     :return: Return a game that represents the next move of current player randomly.
     """
     if type(game) != Othello.Othello:
         raise TypeError("parameter game is not an Othello instance")
+    if not game.legal_moves():
+        # current player has to pass
+        next_game = game.clone()
+        next_game.make_move(None)
+        return next_game
     successors = game.successors()
-    return successors[random.randint(0, len(successors)-1)]
+    return successors[randint(0, len(successors)-1)]
 
 
 def most_eliminate(game):
@@ -27,51 +40,1150 @@ def most_eliminate(game):
     """
     if type(game) != Othello.Othello:
         raise TypeError("parameter game is not an Othello instance")
-    successors = game.successors()
-    least_opponent_piece = game.count_disks(game.switch_turn())
-    most_elimination = successors[0]
-    for successor in successors:
-        new_oppo_piece = successor.count_disks(successor.switch_turn())
-        if new_oppo_piece < least_opponent_piece:
-            least_opponent_piece = new_oppo_piece
-            most_elimination = successor
+    best_position = None
+    most_flips = 0
+    for position, flipped, flip_count in game.iter_moves():
+        if flip_count > most_flips:
+            most_flips = flip_count
+            best_position = position
+    most_elimination = game.clone()
+    most_elimination.make_move(best_position)
     return most_elimination
 
 
-def minmax_move(game, depth, max_player):
+def minmax_move(game, depth, max_player, table=None, workers=None, count=None):
     """
     Make a  best move that maximizes the max_player chances to win.
     :param game: A Othello instance.
     :param deth: number of turns till the end of the game taken into account.
     :param max_player: if the player is white piece or not (boolean value) -> we assume that active player is white piece and opponent is black.
+    :param table: An optional Transposition.TranspositionTable shared by the searches of every move.
+    :param workers: If given, search the moves in parallel with this many processes (see parallel_search).
+    The parallel mode finds the same minimax value with alpha-beta, for the player to move.
+    :param count: An optional function minmax calls at every node it visits, see minmax. Not used by the parallel mode.
     :return: return the best move to make player win the game.
     """
     d = depth
-    successors = game.successors()
-    best_move = successors[0]
-    best_value = minmax(game.clone(best_move), d, False)
-    for successor in successors:
-        value = minmax(game.clone(best_move), d, False)
-        if (max_player and (value > best_value)) or (not max_player and (value < best_value)):
-            best_move = successor
-            best_value =value
+    if workers is not None:
+        best_square, best_value, stats = parallel_search(game, d + 1, workers)
+        best_move = game.clone()
+        if best_square is None:
+            best_move.make_move(None)
+        else:
+            best_move.make_square(best_square)
+        return best_move
+    if not game.legal_moves():
+        # current player has to pass
+        best_move = game.clone()
+        best_move.make_move(None)
+        return best_move
+    if table is not None:
+        table.new_search()
+    best_square = None
+    best_value = None
+    for sq in Bitboard.iter_squares(game.legal_moves()):
+        record = game.make_square(sq)
+        value = minmax(game, d, not max_player, table, count)
+        game.unmake_move(record)
+        if best_value is None or (max_player and (value > best_value)) or (not max_player and (value < best_value)):
+            best_square = sq
+            best_value = value
+    best_move = game.clone()
+    best_move.make_square(best_square)
     return best_move
 
 
+# Mixed into the key of positions searched as the min player, so a table never mixes up
+# the value of a position for the max player with its value for the min player.
+MIN_PLAYER_KEY = 0x9E3779B97F4A7C15
+
+
 # helper function to perform minmax algorithm ########
-def minmax(game, depth, max_player):
+def minmax(game, depth, max_player, table=None, count=None):
     """
-    Returns the most number pieces on the board if the player makes a certain move.
+    Returns the lead of white pieces over black pieces on the board that max_player can get within depth turns.
+    The tree is walked in place with make/unmake moves, game is back to its original state when this returns.
+    If a transposition table is given, positions already searched at least as deep are not searched again.
+    If count is given, it is called with the remaining depth of every node visited, to measure the search.
     """
     if type(game) != Othello.Othello:
         raise TypeError("parameter game is not an Othello instance")
-    if depth <= 0 or game.is_game_over():
-        return game.get_winner()
-    successors = game.successors()
-    if max_player:
-        # maximizing
-        best_value = game.count_disks(1) # because max_player is white.
-        for successor in successors:
-            value = minmax(successor, depth -1, False) # false because next turn would be for black which is a min player.
-            best_value = max(best_value, value)
-        return best_value
+    if count is not None:
+        count(depth)
+    own = game.bitboards[game.current_player]
+    opp = game.bitboards[1 - game.current_player]
+    moves = Bitboard.legal_moves(own, opp)
+    if depth <= 0 or (not moves and not Bitboard.has_legal_move(opp, own)):
+        return game.count_disks(1) - game.count_disks(0)
+    key = None
+    if table is not None:
+        key = game.key if max_player else game.key ^ MIN_PLAYER_KEY
+        entry = table.probe(key)
+        if entry is not None and entry[0] >= depth and entry[2] == Transposition.EXACT:
+            return entry[1]
+    if not moves:
+        # current player has to pass
+        record = game.make_move(None)
+        best_value = minmax(game, depth - 1, not max_player, table, count)
+        game.unmake_move(record)
+        best_square = Transposition.PASS_MOVE
+    else:
+        best_value = None
+        best_square = Transposition.NO_MOVE
+        for sq in Bitboard.iter_squares(moves):
+            record = game.make_square(sq)
+            value = minmax(game, depth - 1, not max_player, table, count)  # next turn belongs to the other player.
+            game.unmake_move(record)
+            if best_value is None or (max_player and value > best_value) or (not max_player and value < best_value):
+                best_value = value
+                best_square = sq
+    if key is not None:
+        table.store(key, depth, best_value, Transposition.EXACT, best_square)
+    return best_value
+
+
+INFINITY = 1000000
+# Added to the score of a finished game, so that a search never prefers a position it only evaluated
+# to a proven win, nor a proven loss to it. Far above the range of every evaluation function here.
+WIN_SCORE = 100000
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+# Move orderings AlphaBeta can use, combined in this order of priority.
+ORDER_BEST = "best"  # the best move found by an earlier search of the position first
+ORDER_CORNERS = "corners"  # corners first
+ORDER_HISTORY = "history"  # moves that caused many cutoffs elsewhere in the tree first
+ALL_ORDERINGS = (ORDER_BEST, ORDER_CORNERS, ORDER_HISTORY)
+
+# The deadline of a timed search is checked when the node count has none of these bits set, every 1024 nodes.
+DEADLINE_CHECK_NODES = 1023
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a timed search when its deadline has passed.
+    """
+    pass
+
+
+def final_score(own, opp):
+    """
+    Score a finished game for a player.
+    :param own: Bitboard of the pieces of the player.
+    :param opp: Bitboard of the pieces of the opponent.
+    :return: The lead of the player in pieces, plus WIN_SCORE for a win or minus WIN_SCORE for a loss.
+    """
+    lead = Bitboard.popcount(own) - Bitboard.popcount(opp)
+    if lead > 0:
+        return lead + WIN_SCORE
+    if lead < 0:
+        return lead - WIN_SCORE
+    return 0
+
+
+def disk_difference(game):
+    """
+    Evaluate a position by the lead of the player to move in number of pieces.
+    :param game: A Othello instance.
+    :return: Pieces of current player minus pieces of the opponent.
+    """
+    return game.count_disks(game.current_player) - game.count_disks(1 - game.current_player)
+
+
+# weights of pieces, corners, x squares, frontier pieces, stable pieces and potential mobility in feature_evaluation
+FEATURE_WEIGHTS = (1, 25, -10, -3, 10, 2)
+
+
+def feature_evaluation(game):
+    """
+    Evaluate a position by a weighted sum of counts Othello finds with a few bitboard operations,
+    so it does not generate any move.
+    :param game: A Othello instance.
+    :return: The score of the player to move, higher is better.
+    """
+    own = game.current_player
+    opp = 1 - own
+    disks, corners, x_squares, frontier, stable, potential_mobility = FEATURE_WEIGHTS
+    return (disks * (game.count_disks(own) - game.count_disks(opp))
+            + corners * (game.count_corners(own) - game.count_corners(opp))
+            + x_squares * (game.count_x_squares(own) - game.count_x_squares(opp))
+            + frontier * (game.count_frontier(own) - game.count_frontier(opp))
+            + stable * (game.count_stable(own) - game.count_stable(opp))
+            + potential_mobility * (game.count_potential_mobility(own) - game.count_potential_mobility(opp)))
+
+
+# Patterns of the pattern evaluation, as (row, col) squares starting from a corner.
+# Every symmetric copy of a pattern on the board is one instance, all the instances of a pattern share its weights.
+PATTERNS = {
+    "edge": tuple((0, col) for col in range(8)),
+    "corner": tuple((row, col) for row in range(3) for col in range(3)),
+    "block": tuple((row, col) for row in range(2) for col in range(5)),  # 2x5 corner block
+    "diagonal8": tuple((i, i) for i in range(8)),
+    "diagonal7": tuple((i, i + 1) for i in range(7)),
+    "diagonal6": tuple((i, i + 2) for i in range(6)),
+    "diagonal5": tuple((i, i + 3) for i in range(5)),
+    "diagonal4": tuple((i, i + 4) for i in range(4)),
+}
+
+# Value of a piece on each square for the default pattern weights, mirrored on the 4 quadrants.
+SQUARE_VALUES = (
+    (100, -20, 10, 5),
+    (-20, -50, -2, -2),
+    (10, -2, -1, -1),
+    (5, -2, -1, -1),
+)
+
+
+def _build_pattern_instances():
+    """
+    :return: A list of (name, squares) tuples, one per instance, squares are bit indices in the order of PATTERNS.
+    """
+    instances = []
+    for name, squares in PATTERNS.items():
+        seen = set()
+        for transform in (lambda r, c: (r, c), lambda r, c: (r, 7 - c), lambda r, c: (7 - r, c),
+                          lambda r, c: (7 - r, 7 - c), lambda r, c: (c, r), lambda r, c: (c, 7 - r),
+                          lambda r, c: (7 - c, r), lambda r, c: (7 - c, 7 - r)):
+            instance = tuple(Bitboard.square(*transform(row, col)) for row, col in squares)
+            if frozenset(instance) not in seen:
+                seen.add(frozenset(instance))
+                instances.append((name, instance))
+    return instances
+
+
+PATTERN_INSTANCES = _build_pattern_instances()
+
+# SQUARE_PATTERNS[sq] lists (instance, power) for every instance holding sq,
+# the digit of sq in the base 3 index of that instance is worth power.
+SQUARE_PATTERNS = tuple(
+    tuple((instance, 3 ** squares.index(sq)) for instance, (_, squares) in enumerate(PATTERN_INSTANCES)
+          if sq in squares)
+    for sq in range(64))
+
+
+def pattern_indices(black, white):
+    """
+    Compute the index of every pattern instance from scratch.
+    The index is a base 3 number with one digit per square of the instance, 0 for empty, 1 for black and 2 for white,
+    the first square of the instance is the lowest digit.
+    :return: A list of indices, one per PATTERN_INSTANCES.
+    """
+    indices = [0] * len(PATTERN_INSTANCES)
+    for sq in Bitboard.iter_squares(black | white):
+        digit = 1 if black >> sq & 1 else 2
+        for instance, power in SQUARE_PATTERNS[sq]:
+            indices[instance] += digit * power
+    return indices
+
+
+def _square_value(sq):
+    row, col = Bitboard.position(sq)
+    return SQUARE_VALUES[min(row, 7 - row)][min(col, 7 - col)]
+
+
+def default_pattern_weights():
+    """
+    Build weights from SQUARE_VALUES: an instance is worth the values of the black pieces minus those of the white ones.
+    Squares next to the corner that starts a pattern are only penalized while that corner is empty.
+    :return: A dictionary from pattern name to an array of 3 ** len(squares) weights, from black's point of view.
+    """
+    weights = {}
+    for name, instance in PATTERN_INSTANCES:
+        if name in weights:
+            continue
+        next_to_corner = Bitboard.neighbours(1 << instance[0]) if Bitboard.CORNERS >> instance[0] & 1 else 0
+        free = [0]  # weights of the squares after the first one, by their index, with the first square empty
+        taken = [0]  # same with the first square taken
+        for sq in instance[1:]:
+            value = _square_value(sq)
+            kept = max(value, 0) if next_to_corner >> sq & 1 else value
+            free = free + [value + low for low in free] + [low - value for low in free]
+            taken = taken + [kept + low for low in taken] + [low - kept for low in taken]
+        value = _square_value(instance[0])
+        table = array('i', bytes(4 * 3 ** len(instance)))
+        for index in range(len(table)):
+            first = index % 3
+            rest = index // 3
+            if first == 0:
+                table[index] = free[rest]
+            else:
+                table[index] = (value if first == 1 else -value) + taken[rest]
+        weights[name] = table
+    return weights
+
+
+class PatternEvaluator:
+    """
+    Evaluate positions by the weights of the contents of every pattern instance, use it as the evaluate function
+    of AlphaBeta: AlphaBeta(evaluate=PatternEvaluator()).
+
+    It remembers the indices and the score of the last position it evaluated. For the next position only
+    the squares that changed since then are looked at, and only the instances holding them are updated,
+    so evaluating the leaves of a search, which differ by a few moves, costs a few table lookups per changed square.
+    """
+
+    def __init__(self, weights=None):
+        """
+        :param weights: A dictionary from each name of PATTERNS to its 3 ** len(squares) weights from black's point
+        of view, see pattern_indices for the meaning of an index. default_pattern_weights() by default.
+        """
+        if weights is None:
+            weights = default_pattern_weights()
+        self.tables = [weights[name] for name, _ in PATTERN_INSTANCES]
+        self.indices = [0] * len(PATTERN_INSTANCES)
+        self.score = sum(table[0] for table in self.tables)
+        self.black = 0
+        self.white = 0
+
+    def __call__(self, game):
+        """
+        :param game: A Othello instance.
+        :return: The score of the player to move, higher is better.
+        """
+        black, white = game.bitboards
+        if black != self.black or white != self.white:
+            self.update(black, white)
+        return self.score if game.current_player == 0 else -self.score
+
+    def update(self, black, white):
+        """
+        Move the indices and the score from the last position evaluated to the position (black, white).
+        """
+        indices = self.indices
+        tables = self.tables
+        score = self.score
+        for sq in Bitboard.iter_squares((black ^ self.black) | (white ^ self.white)):
+            # new digit minus old digit of sq, digits are 0 for empty, 1 for black, 2 for white
+            change = ((black >> sq & 1) + 2 * (white >> sq & 1)) - ((self.black >> sq & 1) + 2 * (self.white >> sq & 1))
+            for instance, power in SQUARE_PATTERNS[sq]:
+                table = tables[instance]
+                index = indices[instance]
+                score -= table[index]
+                index += change * power
+                score += table[index]
+                indices[instance] = index
+        self.score = score
+        self.black = black
+        self.white = white
+
+
+class AlphaBeta:
+    """
+    Alpha-beta search in the negamax form: every score is from the point of view of the player to move,
+    so the same code searches for both white and black.
+
+    The position is searched in place with make/unmake moves.
+    Results are kept in a transposition table, which also gives the best move of earlier searches for ordering.
+    Counters of the last search are kept in nodes and cutoffs.
+    Finished games are scored with final_score, so a proven win or loss outweighs any evaluation.
+    """
+
+    def __init__(self, ordering=ALL_ORDERINGS, table=None, evaluate=disk_difference):
+        """
+        :param ordering: The move orderings to use, any of ORDER_BEST, ORDER_CORNERS and ORDER_HISTORY.
+        :param table: A Transposition.TranspositionTable, a new 16 MB one is made if not given.
+        :param evaluate: Function scoring a position for the player to move, used at the depth limit.
+        Its scores have to stay well below WIN_SCORE.
+        """
+        for name in ordering:
+            if name not in ALL_ORDERINGS:
+                raise ValueError(str.format("Unknown move ordering {0}", name))
+        self.ordering = tuple(ordering)
+        self.table = table if table is not None else Transposition.TranspositionTable()
+        self.evaluate = evaluate
+        self.history = [0] * 64
+        self.root_scores = []
+        self.deadline = None  # time.perf_counter() value to stop searching at
+        self.stop_flag = None  # a buffer, searching stops when its first byte is not 0
+        self.nodes = 0
+        self.cutoffs = 0
+
+    def order(self, moves, best_move):
+        """
+        Sort moves according to the orderings of this search.
+        :param moves: A bitboard of legal moves.
+        :param best_move: The bit index of the best move stored for the position, or Transposition.NO_MOVE.
+        :return: A list of bit indices, the first one is searched first.
+        """
+        squares = list(Bitboard.iter_squares(moves))
+        if len(squares) < 2 or not self.ordering:
+            return squares
+        use_best = ORDER_BEST in self.ordering
+        use_corners = ORDER_CORNERS in self.ordering
+        use_history = ORDER_HISTORY in self.ordering
+        history = self.history
+
+        def rank(sq):
+            return (use_best and sq == best_move,
+                    use_corners and CORNERS >> sq & 1,
+                    history[sq] if use_history else 0)
+        squares.sort(key=rank, reverse=True)
+        return squares
+
+    def search(self, game, depth):
+        """
+        Search game to depth plies.
+        :param game: A Othello instance, it is back to its original state when this returns.
+        :param depth: Number of plies to search.
+        :return: A tuple (square, score). square is the bit index of the best move, None if the player has to pass.
+        score is from the point of view of the player to move.
+        """
+        self.nodes = 0
+        self.cutoffs = 0
+        self.table.new_search()
+        return self.search_root(game, depth)
+
+    def search_root(self, game, depth, root_order=None):
+        """
+        Search the moves of the root position, same as search but the counters and table age are left alone.
+        :param root_order: Bit indices of the root moves in the order to search them,
+        if not given the moves are ordered like any other position.
+        The score of every root move is left in root_scores as (score, square) tuples, best move first.
+        Scores of moves other than the best one are upper bounds.
+        """
+        moves = game.legal_moves()
+        self.root_scores = []
+        if not moves or depth <= 0:
+            return None, self.negamax(game, depth, -INFINITY, INFINITY)
+        self.nodes += 1
+        if root_order is None:
+            entry = self.table.probe(game.key)
+            root_order = self.order(moves, entry[3] if entry is not None else Transposition.NO_MOVE)
+        best_square = None
+        alpha = -INFINITY
+        for sq in root_order:
+            record = game.make_square(sq)
+            score = -self.negamax(game, depth - 1, -INFINITY, -alpha)
+            game.unmake_move(record)
+            self.root_scores.append((score, sq))
+            if best_square is None or score > alpha:
+                alpha = score
+                best_square = sq
+        self.root_scores.sort(key=lambda item: item[0], reverse=True)  # stable, the best move stays first
+        self.table.store(game.key, depth, alpha, Transposition.EXACT, best_square)
+        return best_square, alpha
+
+    def iterative_deepening(self, game, time_limit_ms, max_depth=None):
+        """
+        Search game 1 ply deeper at a time until the time limit is reached.
+        Each iteration searches the root moves in the order of the scores of the previous one,
+        and the inner positions get the best moves of the previous one from the transposition table.
+        The clock is only read every DEADLINE_CHECK_NODES nodes.
+        :param game: A Othello instance, it is not changed.
+        :param time_limit_ms: The time limit in milliseconds. The first ply is always completed.
+        :param max_depth: The deepest iteration, by default the number of empty squares.
+        :return: A tuple (square, score, depth) of the deepest completed iteration.
+        """
+        if max_depth is None:
+            max_depth = 64 - Bitboard.popcount(game.bitboards[0] | game.bitboards[1])
+        game = game.clone()  # a search stopped by the deadline leaves its position half played
+        self.nodes = 0
+        self.cutoffs = 0
+        self.table.new_search()
+        deadline = time.perf_counter() + time_limit_ms / 1000.0
+        result = None
+        root_order = None
+        depth = 1
+        try:
+            while True:
+                square, score = self.search_root(game, depth, root_order)
+                result = (square, score, depth)
+                root_order = [sq for _, sq in self.root_scores] or None
+                if depth >= max_depth or time.perf_counter() >= deadline:
+                    break
+                self.deadline = deadline
+                depth += 1
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+        return result
+
+    def interrupted(self):
+        """
+        Only called every DEADLINE_CHECK_NODES nodes, to keep the cost of reading the clock low.
+        :return: True iff the deadline has passed or the stop flag is raised.
+        """
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return True
+        return self.stop_flag is not None and self.stop_flag[0] != 0
+
+    def negamax(self, game, depth, alpha, beta):
+        """
+        :return: The score of game for the player to move, searched to depth plies within the window (alpha, beta).
+        :raise SearchTimeout: If the deadline has passed or the stop flag is raised.
+        """
+        self.nodes += 1
+        if not self.nodes & DEADLINE_CHECK_NODES and self.interrupted():
+            raise SearchTimeout()
+        player = game.current_player
+        own = game.bitboards[player]
+        opp = game.bitboards[1 - player]
+        moves = Bitboard.legal_moves(own, opp)
+        if not moves and not Bitboard.has_legal_move(opp, own):
+            return final_score(own, opp)  # game over
+        if depth <= 0:
+            return self.evaluate(game)
+
+        original_alpha = alpha
+        key = game.key
+        entry = self.table.probe(key)
+        best_move = Transposition.NO_MOVE
+        if entry is not None:
+            entry_depth, score, bound, best_move = entry
+            if entry_depth >= depth:
+                if bound == Transposition.EXACT:
+                    return score
+                if bound == Transposition.LOWER and score >= beta:
+                    return score
+                if bound == Transposition.UPPER and score <= alpha:
+                    return score
+
+        if not moves:
+            # current player has to pass
+            record = game.make_move(None)
+            best_score = -self.negamax(game, depth - 1, -beta, -alpha)
+            game.unmake_move(record)
+            best_move = Transposition.PASS_MOVE
+        else:
+            best_score = -INFINITY
+            for sq in self.order(moves, best_move):
+                record = game.make_square(sq)
+                score = -self.negamax(game, depth - 1, -beta, -alpha)
+                game.unmake_move(record)
+                if score > best_score:
+                    best_score = score
+                    best_move = sq
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            self.cutoffs += 1
+                            self.history[sq] += depth * depth
+                            break
+
+        if best_score <= original_alpha:
+            bound = Transposition.UPPER
+        elif best_score >= beta:
+            bound = Transposition.LOWER
+        else:
+            bound = Transposition.EXACT
+        self.table.store(key, depth, best_score, bound, best_move)
+        return best_score
+
+
+def alphabeta_move(game, depth, ordering=ALL_ORDERINGS, table=None):
+    """
+    Make the best move for the player to move found by an alpha-beta search.
+    :param game: A Othello instance.
+    :param depth: Number of plies to search, including the move itself.
+    :param ordering: The move orderings to use, see AlphaBeta.
+    :param table: An optional Transposition.TranspositionTable to keep between moves.
+    :return: An Othello instance with the move made.
+    """
+    if type(game) != Othello.Othello:
+        raise TypeError("parameter game is not an Othello instance")
+    square, score = AlphaBeta(ordering, table).search(game, depth)
+    best_move = game.clone()
+    if square is None:
+        best_move.make_move(None)
+    else:
+        best_move.make_square(square)
+    return best_move
+
+
+def best_move(game, time_limit_ms, ordering=ALL_ORDERINGS, table=None, book=None, workers=None):
+    """
+    Make the best move for the player to move found by iterative deepening within a time limit.
+    :param game: A Othello instance.
+    :param time_limit_ms: How long to search for, in milliseconds.
+    :param ordering: The move orderings to use, see AlphaBeta.
+    :param table: An optional Transposition.TranspositionTable to keep between moves.
+    :param book: An optional OpeningBook.OpeningBook, positions found in it are played without searching.
+    :param workers: If more than 1, search with this many processes sharing one transposition table
+    (see lazy_smp_search), table is not used then.
+    :return: An Othello instance with the move made.
+    """
+    if type(game) != Othello.Othello:
+        raise TypeError("parameter game is not an Othello instance")
+    square = book.best_move(game) if book is not None else None
+    if square is None and workers is not None and workers > 1:
+        square, score, stats = lazy_smp_search(game, time_limit_ms, workers)
+    elif square is None:
+        square, score, depth = AlphaBeta(ordering, table).iterative_deepening(game, time_limit_ms)
+    next_game = game.clone()
+    if square is None:
+        next_game.make_move(None)
+    else:
+        next_game.make_square(square)
+    return next_game
+
+
+def search_move(black, white, player, sq, depth, alpha, table_mb=16):
+    """
+    Search one root move in its own transposition table. Runs in the worker processes of parallel_search,
+    so it takes plain bitboards instead of an Othello instance.
+    :param alpha: The best score already found for the other root moves, the move only matters if it beats it.
+    :return: A tuple (square, score, nodes). score is from the point of view of player,
+    it is an upper bound if it is not above alpha.
+    """
+    game = Othello.Othello.from_bitboards(black, white, player)
+    game.make_square(sq)
+    search = AlphaBeta(table=Transposition.TranspositionTable(table_mb))
+    score = -search.negamax(game, depth - 1, -INFINITY, -alpha)
+    return sq, score, search.nodes
+
+
+def parallel_search(game, depth, workers=None, executor=None, table_mb=16):
+    """
+    Alpha-beta search with the root moves spread across processes.
+    The root moves are ordered by a shallow search, the first one is searched here to get a score to beat,
+    then the others are handed out to the workers. Every finished move raises the score to beat
+    for the moves handed out after it, so later moves are searched with a tighter window.
+    :param game: A Othello instance.
+    :param depth: Number of plies to search, including the root move.
+    :param workers: Number of moves searched at the same time, by default the number of processors.
+    :param executor: An optional concurrent.futures executor to reuse between searches,
+    by default a ProcessPoolExecutor is started and shut down for this search.
+    :param table_mb: Memory budget of the transposition table of each move search.
+    :return: A tuple (square, score, stats). square and score are like AlphaBeta.search,
+    stats is a dictionary with the total "nodes", the "seconds" taken and the number of "workers".
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    moves = game.legal_moves()
+    if not moves or depth <= 1:
+        search = AlphaBeta()
+        square, score = search.search(game, depth)
+        return square, score, {"nodes": search.nodes, "seconds": time.perf_counter() - start, "workers": 1}
+
+    ordering = AlphaBeta(table=Transposition.TranspositionTable(1))
+    ordering.search(game, min(depth - 1, 3))
+    order = [sq for _, sq in ordering.root_scores]
+    black, white, player = game.bitboards[0], game.bitboards[1], game.current_player
+    best_square, alpha, nodes = search_move(black, white, player, order[0], depth, -INFINITY, table_mb)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+    try:
+        remaining = order[1:]
+        pending = set()
+        while remaining or pending:
+            while remaining and len(pending) < workers:
+                pending.add(executor.submit(search_move, black, white, player, remaining.pop(0), depth, alpha, table_mb))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sq, score, move_nodes = future.result()
+                nodes += move_nodes
+                if score > alpha:
+                    alpha = score
+                    best_square = sq
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return best_square, alpha, {"nodes": nodes, "seconds": time.perf_counter() - start, "workers": workers}
+
+
+def parallel_speedup(game, depth, workers=None):
+    """
+    Compare a single process AlphaBeta search of game with parallel_search.
+    :return: A dictionary with the "serial_seconds" and "parallel_seconds" taken, the nodes searched by each
+    ("serial_nodes", "parallel_nodes"), the "speedup" (serial time over parallel time), the number of "workers"
+    and the "speedup_per_core" (speedup over workers).
+    """
+    start = time.perf_counter()
+    search = AlphaBeta()
+    search.search(game, depth)
+    serial_seconds = time.perf_counter() - start
+    square, score, stats = parallel_search(game, depth, workers)
+    speedup = serial_seconds / stats["seconds"] if stats["seconds"] else 0.0
+    return {"serial_seconds": serial_seconds, "parallel_seconds": stats["seconds"],
+            "serial_nodes": search.nodes, "parallel_nodes": stats["nodes"],
+            "speedup": speedup, "workers": stats["workers"], "speedup_per_core": speedup / stats["workers"]}
+
+
+def smp_helper(table_name, stop_name, table_mb, black, white, player, max_depth, index):
+    """
+    Search of a helper process of lazy_smp_search. It deepens iteratively like the main search,
+    but helpers with an odd index start one ply deeper and every helper rotates the root moves by its index,
+    so the helpers fill the shared table with different parts of the tree.
+    :return: The number of nodes searched.
+    """
+    table = Transposition.SharedTranspositionTable(table_mb, table_name)
+    stop = shared_memory.SharedMemory(name=stop_name)
+    search = AlphaBeta(table=table)
+    search.stop_flag = stop.buf
+    game = Othello.Othello.from_bitboards(black, white, player)
+    table.new_search()
+    nodes = 0
+    try:
+        root_order = None
+        for depth in range(1 + index % 2, max_depth + 1):
+            search.nodes = 0
+            search.search_root(game, depth, root_order)
+            nodes += search.nodes
+            root_order = [sq for _, sq in search.root_scores]
+            if root_order:
+                shift = index % len(root_order)
+                root_order = root_order[shift:] + root_order[:shift]
+    except SearchTimeout:
+        nodes += search.nodes
+    finally:
+        search.stop_flag = None
+        table.close()
+        stop.close()
+    return nodes
+
+
+def lazy_smp_search(game, time_limit_ms, workers=None, max_depth=None, table_mb=64):
+    """
+    Lazy SMP: several processes search the same position at once, sharing one transposition table
+    in shared memory. The main search runs in this process, the helpers only fill the table with
+    results the main search can use. The helpers are stopped when the main search is done.
+    :param game: A Othello instance, it is not changed.
+    :param time_limit_ms: Time limit of the main search, see AlphaBeta.iterative_deepening.
+    :param workers: Total number of searching processes including this one, by default the number of processors.
+    :param max_depth: The deepest iteration, by default the number of empty squares.
+    :param table_mb: Memory budget of the shared table.
+    :return: A tuple (square, score, stats). square and score are like AlphaBeta.search, stats is a dictionary
+    with the "depth" reached, the "nodes" searched by all processes, the "seconds" taken,
+    the number of "workers", the "nodes_per_second" and the table hits, misses and overwrites of the main search.
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    if max_depth is None:
+        max_depth = 64 - Bitboard.popcount(game.bitboards[0] | game.bitboards[1])
+    table = Transposition.SharedTranspositionTable(table_mb)
+    stop = shared_memory.SharedMemory(create=True, size=1)
+    stop.buf[0] = 0
+    executor = ProcessPoolExecutor(workers - 1) if workers > 1 else None
+    try:
+        helpers = []
+        if executor is not None:
+            helpers = [executor.submit(smp_helper, table.name, stop.name, table_mb, game.bitboards[0],
+                                       game.bitboards[1], game.current_player, max_depth, index)
+                       for index in range(1, workers)]
+        search = AlphaBeta(table=table)
+        square, score, depth = search.iterative_deepening(game, time_limit_ms, max_depth)
+        nodes = search.nodes
+        stop.buf[0] = 1
+        for helper in helpers:
+            nodes += helper.result()
+    finally:
+        stop.buf[0] = 1
+        if executor is not None:
+            executor.shutdown()
+        table.close()
+        table.unlink()
+        stop.close()
+        stop.unlink()
+    seconds = time.perf_counter() - start
+    stats = {"depth": depth, "nodes": nodes, "seconds": seconds, "workers": workers,
+             "nodes_per_second": nodes / seconds if seconds else 0.0}
+    stats.update(search.table.stats())
+    return square, score, stats
+
+
+def smp_scaling(game, time_limit_ms, max_workers=None):
+    """
+    Measure how lazy_smp_search scales: search game for the same time with 1 to max_workers processes.
+    :return: A list with the stats of lazy_smp_search for each number of processes.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    return [lazy_smp_search(game, time_limit_ms, workers)[2] for workers in range(1, max_workers + 1)]
+
+
+def compare_orderings(game, depth, table_mb=16):
+    """
+    Search game once without move ordering, once per single ordering and once with all of them,
+    each time with a new transposition table, to measure how many nodes each ordering saves.
+    :return: A dictionary from ordering name ("none", "all" or one of ALL_ORDERINGS) to a tuple (nodes, saved),
+    where saved is the number of nodes saved compared to no ordering.
+    """
+    runs = [("none", ())] + [(name, (name,)) for name in ALL_ORDERINGS] + [("all", ALL_ORDERINGS)]
+    report = {}
+    baseline = None
+    for name, ordering in runs:
+        search = AlphaBeta(ordering, Transposition.TranspositionTable(table_mb))
+        search.search(game, depth)
+        if baseline is None:
+            baseline = search.nodes
+        report[name] = (search.nodes, baseline - search.nodes)
+    return report
+
+
+# The four 4x4 quadrants of the board, the regions used for parity ordering in the endgame.
+QUADRANTS = (0x000000000F0F0F0F, 0x00000000F0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000)
+# With more empty squares than this, the endgame solver orders moves fastest first, otherwise by parity only.
+FASTEST_FIRST_EMPTIES = 6
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+class EndgameSolver:
+    """
+    Perfect play search for the last empty squares of a game.
+    The search goes to the end of the game, scores are the final lead in pieces of the player to move.
+
+    It works directly on bitboards. Moves are ordered fastest first (moves that leave the opponent
+    the fewest replies first) and then by parity (moves in quadrants with an odd number of empty squares first).
+    Positions are cut early when stable disks (Bitboard.stable) prove the score is outside the search window.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+
+    def solve(self, game):
+        """
+        :param game: A Othello instance, best with no more than about 20 empty squares.
+        :return: A tuple (square, margin). margin is the final lead in pieces of the player to move with perfect play,
+        square is the bit index of a move reaching it, None if the player has to pass or the game is over.
+        """
+        return self.solve_window(game, -64, 64)
+
+    def outcome(self, game):
+        """
+        Only find out whether the player to move wins, which is faster than finding the exact margin.
+        :param game: A Othello instance.
+        :return: A tuple (square, result). result is WIN, DRAW or LOSS for the player to move with perfect play,
+        square is a move reaching it, None if the player has to pass or the game is over.
+        """
+        square, margin = self.solve_window(game, -1, 1)
+        if margin > 0:
+            return square, WIN
+        if margin < 0:
+            return square, LOSS
+        return square, DRAW
+
+    def solve_window(self, game, alpha, beta):
+        """
+        Search the moves of game within the window (alpha, beta).
+        :return: A tuple (square, margin), see solve. margin is only exact if it falls inside the window.
+        """
+        self.nodes = 0
+        own = game.bitboards[game.current_player]
+        opp = game.bitboards[1 - game.current_player]
+        moves = Bitboard.legal_moves(own, opp)
+        if not moves:
+            return None, self.search(own, opp, alpha, beta)
+        self.nodes += 1
+        best_square = None
+        for sq, flipped in self.order(own, opp, moves):
+            score = -self.search(opp ^ flipped, own | flipped | (1 << sq), -beta, -alpha)
+            if best_square is None or score > alpha:
+                alpha = score
+                best_square = sq
+                if alpha >= beta:
+                    break
+        return best_square, alpha
+
+    def order(self, own, opp, moves):
+        """
+        :return: A list of (square, flipped) tuples of the moves, in the order to search them.
+        """
+        empty = ~(own | opp) & Bitboard.FULL
+        odd = 0
+        for quadrant in QUADRANTS:
+            if Bitboard.popcount(empty & quadrant) & 1:
+                odd |= quadrant
+        ranked = []
+        fastest_first = Bitboard.popcount(empty) > FASTEST_FIRST_EMPTIES
+        for sq in Bitboard.iter_squares(moves):
+            flipped = Bitboard.flips(own, opp, sq)
+            replies = 0
+            if fastest_first:
+                replies = Bitboard.popcount(Bitboard.legal_moves(opp ^ flipped, own | flipped | (1 << sq)))
+            ranked.append((replies, not odd >> sq & 1, sq, flipped))
+        ranked.sort()
+        return [(sq, flipped) for _, _, sq, flipped in ranked]
+
+    def search(self, own, opp, alpha, beta):
+        """
+        :return: The final lead in pieces of own, the player to move, within the window (alpha, beta).
+        """
+        self.nodes += 1
+        moves = Bitboard.legal_moves(own, opp)
+        if not moves:
+            if not Bitboard.has_legal_move(opp, own):
+                return Bitboard.popcount(own) - Bitboard.popcount(opp)  # game over
+            return -self.search(opp, own, -beta, -alpha)  # pass
+
+        # stable disks of the opponent are never ours, which caps the final lead, and the other way around.
+        # Stability is only computed when counting every disk as stable could prove a cutoff.
+        if 64 - 2 * Bitboard.popcount(opp) <= alpha:
+            upper = 64 - 2 * Bitboard.popcount(Bitboard.stable(opp, own))
+            if upper <= alpha:
+                return upper
+        if 2 * Bitboard.popcount(own) - 64 >= beta:
+            lower = 2 * Bitboard.popcount(Bitboard.stable(own, opp)) - 64
+            if lower >= beta:
+                return lower
+
+        best_score = -64
+        for sq, flipped in self.order(own, opp, moves):
+            score = -self.search(opp ^ flipped, own | flipped | (1 << sq), -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+
+def endgame_move(game):
+    """
+    Make the move of perfect play for the player to move. Only practical with few empty squares left.
+    :param game: A Othello instance.
+    :return: An Othello instance with the move made.
+    """
+    if type(game) != Othello.Othello:
+        raise TypeError("parameter game is not an Othello instance")
+    square, margin = EndgameSolver().solve(game)
+    next_game = game.clone()
+    if square is None:
+        next_game.make_move(None)
+    else:
+        next_game.make_square(square)
+    return next_game
+
+
+UCT_EXPLORATION = 1.4
+NO_CHILDREN = -1  # first_child of a node that was never expanded
+
+
+class MonteCarlo:
+    """
+    Monte Carlo tree search with the UCT rule: every iteration walks down the tree to a leaf,
+    picking the child with the best upper confidence bound, adds the children of the leaf,
+    plays a random game from there and counts its result in every node of the path.
+
+    The tree is stored in parallel arrays, node i is entry i of every array. The children of a node are created
+    together when it is expanded, so they are the nodes first_child[i] to first_child[i] + child_counts[i] - 1.
+    Nodes do not store positions, the walk down the tree plays the moves on two bitboards.
+    wins[i] counts the playouts won through node i by the player who made the move leading to it, draws count half.
+
+    The same instance can search the next moves of a game: when the new position is within 2 moves
+    of the last one searched, the matching subtree is kept and the rest of the tree is dropped.
+    """
+
+    def __init__(self, exploration=UCT_EXPLORATION, seed=None):
+        """
+        :param exploration: The weight of the exploration term of UCT.
+        :param seed: Seed of the random playouts.
+        """
+        self.exploration = exploration
+        self.rng = Random(seed)
+        self.playouts = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the whole tree.
+        """
+        self.parents = array('i')
+        self.moves = array('B')  # the move leading to the node, a bit index or Transposition.PASS_MOVE
+        self.first_child = array('i')
+        self.child_counts = array('B')
+        self.visits = array('I')
+        self.wins = array('d')
+        self.root = None  # (own, opp) bitboards of node 0, own is the player to move
+
+    def add_node(self, parent, move, visits=0, wins=0.0):
+        self.parents.append(parent)
+        self.moves.append(move)
+        self.first_child.append(NO_CHILDREN)
+        self.child_counts.append(0)
+        self.visits.append(visits)
+        self.wins.append(wins)
+
+    def search(self, game, iterations=None, time_limit_ms=None):
+        """
+        :param game: A Othello instance, it is not changed.
+        :param iterations: Number of playouts to run.
+        :param time_limit_ms: Time limit in milliseconds, the search stops at whichever limit comes first.
+        If neither limit is given, 1000 playouts are run. At least one playout is always run,
+        so the root is expanded and a move is found even with no time left.
+        :return: The bit index of the most visited move, None if the player has to pass or the game is over.
+        """
+        if iterations is None and time_limit_ms is None:
+            iterations = 1000
+        self.reuse(game.bitboards[game.current_player], game.bitboards[1 - game.current_player])
+        deadline = None if time_limit_ms is None else time.perf_counter() + time_limit_ms / 1000.0
+        self.iterate()
+        done = 1
+        while (iterations is None or done < iterations) and (deadline is None or time.perf_counter() < deadline):
+            self.iterate()
+            done += 1
+        self.playouts = done
+        best = None
+        first = self.first_child[0]
+        for child in range(first, first + self.child_counts[0]):
+            if best is None or self.visits[child] > self.visits[best]:
+                best = child
+        if best is None or self.moves[best] == Transposition.PASS_MOVE:
+            return None
+        return self.moves[best]
+
+    def iterate(self):
+        """
+        Run one iteration: select a leaf, expand it, play it out and count the result.
+        """
+        parents = self.parents
+        moves = self.moves
+        first_child = self.first_child
+        child_counts = self.child_counts
+        visits = self.visits
+        wins = self.wins
+        own, opp = self.root
+        node = 0
+        while child_counts[node]:  # selection
+            first = first_child[node]
+            log_visits = math.log(visits[node])
+            best = first
+            best_score = -1.0
+            for child in range(first, first + child_counts[node]):
+                child_visits = visits[child]
+                if not child_visits:
+                    best = child
+                    break
+                score = wins[child] / child_visits + self.exploration * math.sqrt(log_visits / child_visits)
+                if score > best_score:
+                    best_score = score
+                    best = child
+            node = best
+            own, opp = self.play(own, opp, moves[node])
+
+        if first_child[node] == NO_CHILDREN and (visits[node] or node == 0):  # expansion
+            first = len(visits)
+            legal = Bitboard.legal_moves(own, opp)
+            if legal:
+                for sq in Bitboard.iter_squares(legal):
+                    self.add_node(node, sq)
+            elif Bitboard.has_legal_move(opp, own):
+                self.add_node(node, Transposition.PASS_MOVE)
+            first_child[node] = first
+            child_counts[node] = len(visits) - first
+            if child_counts[node]:
+                node = first
+                own, opp = self.play(own, opp, moves[node])
+
+        lead = self.playout(own, opp)
+        # reward of the player who moved into node, the opponent of the player to move at node
+        reward = 1.0 if lead < 0 else 0.0 if lead > 0 else 0.5
+        while node >= 0:  # backpropagation
+            visits[node] += 1
+            wins[node] += reward
+            reward = 1.0 - reward
+            node = parents[node]
+
+    @staticmethod
+    def play(own, opp, move):
+        """
+        :return: The (own, opp) bitboards after own plays move, own is the player to move next.
+        """
+        if move == Transposition.PASS_MOVE:
+            return opp, own
+        flipped = Bitboard.flips(own, opp, move)
+        return opp ^ flipped, own | flipped | (1 << move)
+
+    def playout(self, own, opp):
+        """
+        Play random moves to the end of the game on the bitboards alone, nothing is allocated but integers.
+        :return: The final lead in pieces of own, the player to move at the start.
+        """
+        random_fraction = self.rng.random
+        legal_moves = Bitboard.legal_moves
+        flips = Bitboard.flips
+        popcount = Bitboard.popcount
+        sign = 1
+        passed = False
+        while True:
+            moves = legal_moves(own, opp)
+            if not moves:
+                if passed:
+                    break  # neither player can move
+                passed = True
+                own, opp = opp, own
+                sign = -sign
+                continue
+            passed = False
+            skip = int(random_fraction() * popcount(moves))
+            while skip:  # drop the lowest moves to pick a random one
+                moves &= moves - 1
+                skip -= 1
+            bit = moves & -moves
+            flipped = flips(own, opp, bit.bit_length() - 1)
+            own, opp = opp ^ flipped, own | flipped | bit
+            sign = -sign
+        return sign * (popcount(own) - popcount(opp))
+
+    def reuse(self, own, opp):
+        """
+        Make the position (own, opp) the root. If it is the root or a node up to 2 moves below it,
+        its subtree is kept, otherwise the tree starts over.
+        """
+        if self.root == (own, opp):
+            return
+        if self.root is not None:
+            candidates = [(0, self.root[0], self.root[1], 0)]
+            while candidates:
+                node, node_own, node_opp, depth = candidates.pop()
+                if node_own == own and node_opp == opp:
+                    self.keep_subtree(node)
+                    self.root = (own, opp)
+                    return
+                if depth < 2:
+                    first = self.first_child[node]
+                    for child in range(first, first + self.child_counts[node]):
+                        child_own, child_opp = self.play(node_own, node_opp, self.moves[child])
+                        candidates.append((child, child_own, child_opp, depth + 1))
+        self.reset()
+        self.add_node(-1, Transposition.PASS_MOVE)
+        self.root = (own, opp)
+
+    def keep_subtree(self, root):
+        """
+        Copy the subtree of root into new arrays, with root as node 0, and drop the rest of the tree.
+        Nodes are copied a block of children at a time, so the children of a node stay next to each other.
+        """
+        moves = self.moves
+        first_child = self.first_child
+        child_counts = self.child_counts
+        visits = self.visits
+        wins = self.wins
+        self.reset()
+        self.add_node(-1, moves[root], visits[root], wins[root])
+        queue = [(root, 0)]  # (old index, new index) of the copied nodes
+        for old_node, new_node in queue:  # the queue grows while it is walked
+            if first_child[old_node] == NO_CHILDREN:
+                continue
+            first = first_child[old_node]
+            self.first_child[new_node] = len(self.visits)
+            self.child_counts[new_node] = child_counts[old_node]
+            for child in range(first, first + child_counts[old_node]):
+                queue.append((child, len(self.visits)))
+                self.add_node(new_node, moves[child], visits[child], wins[child])
+
+
+def mcts_move(game, iterations=1000, time_limit_ms=None, tree=None):
+    """
+    Make a move chosen by Monte Carlo tree search.
+    :param game: A Othello instance.
+    :param iterations: Number of playouts, see MonteCarlo.search.
+    :param time_limit_ms: Optional time limit in milliseconds.
+    :param tree: A MonteCarlo instance to search with, pass the same one for every move of a game to reuse its tree.
+    :return: An Othello instance with the move made.
+    """
+    if type(game) != Othello.Othello:
+        raise TypeError("parameter game is not an Othello instance")
+    if tree is None:
+        tree = MonteCarlo()
+    square = tree.search(game, iterations, time_limit_ms)
+    next_game = game.clone()
+    if not game.legal_moves():
+        next_game.make_move(None)
+    else:
+        next_game.make_square(square)
+    return next_game
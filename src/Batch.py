@@ -0,0 +1,208 @@
+"""
+Batch.py scores and expands many Othello positions at once with NumPy.
+
+Positions are packed in a (N, 2) numpy.uint64 array of bitboards (see Bitboard.py):
+column 0 is the player to move and column 1 is the opponent.
+Every function works on whole columns of such an array, there is no Python loop per position.
+
+Requires NumPy.
+"""
+import numpy
+import Bitboard
+
+PASS_MOVE = 64  # the move of a child where the player had to pass
+
+FEATURES = ("disks", "mobility", "corners", "frontier")
+# Weights of FEATURES used by evaluate, a wide frontier is bad so it counts negatively.
+DEFAULT_WEIGHTS = (1, 5, 25, -3)
+
+_CORNERS = numpy.uint64((1 << 0) | (1 << 7) | (1 << 56) | (1 << 63))
+_LEFT_SHIFTS = tuple((numpy.uint64(shift), numpy.uint64(mask)) for shift, mask in Bitboard.LEFT_SHIFTS)
+_RIGHT_SHIFTS = tuple((numpy.uint64(shift), numpy.uint64(mask)) for shift, mask in Bitboard.RIGHT_SHIFTS)
+_SQUARE_BITS = numpy.left_shift(numpy.uint64(1), numpy.arange(64, dtype=numpy.uint64))
+
+
+def pack(games):
+    """
+    :param games: A list of Othello instances.
+    :return: A (N, 2) numpy.uint64 array of (player to move, opponent) bitboards.
+    """
+    positions = numpy.empty((len(games), 2), dtype=numpy.uint64)
+    for index, game in enumerate(games):
+        positions[index, 0] = game.bitboards[game.current_player]
+        positions[index, 1] = game.bitboards[1 - game.current_player]
+    return positions
+
+
+def from_cells(cells):
+    """
+    :param cells: A (N, 64) integer array, 1 for a piece of the player to move, -1 for the opponent, 0 for empty.
+    Cell i is the square of bit index i.
+    :return: A (N, 2) numpy.uint64 array of (player to move, opponent) bitboards.
+    """
+    cells = numpy.asarray(cells)
+    positions = numpy.empty((cells.shape[0], 2), dtype=numpy.uint64)
+    positions[:, 0] = numpy.bitwise_or.reduce(numpy.where(cells == 1, _SQUARE_BITS, numpy.uint64(0)), axis=1)
+    positions[:, 1] = numpy.bitwise_or.reduce(numpy.where(cells == -1, _SQUARE_BITS, numpy.uint64(0)), axis=1)
+    return positions
+
+
+if hasattr(numpy, "bitwise_count"):
+    def popcount(bits):
+        """
+        :return: The number of set bits of every element of a numpy.uint64 array.
+        """
+        return numpy.bitwise_count(bits).astype(numpy.int32)
+else:
+    def popcount(bits):
+        """
+        :return: The number of set bits of every element of a numpy.uint64 array.
+        """
+        bits = bits - ((bits >> numpy.uint64(1)) & numpy.uint64(0x5555555555555555))
+        bits = (bits & numpy.uint64(0x3333333333333333)) + ((bits >> numpy.uint64(2)) & numpy.uint64(0x3333333333333333))
+        bits = (bits + (bits >> numpy.uint64(4))) & numpy.uint64(0x0F0F0F0F0F0F0F0F)
+        return ((bits * numpy.uint64(0x0101010101010101)) >> numpy.uint64(56)).astype(numpy.int32)
+
+
+def legal_moves(own, opp):
+    """
+    Same as Bitboard.legal_moves, for arrays of bitboards.
+    :return: A numpy.uint64 array of legal move bitboards.
+    """
+    empty = ~(own | opp)
+    moves = numpy.zeros_like(own)
+    for shift, mask in _LEFT_SHIFTS:
+        run_mask = opp & mask
+        run = (own << shift) & run_mask
+        for _ in range(5):
+            run |= (run << shift) & run_mask
+        moves |= (run << shift) & mask
+    for shift, mask in _RIGHT_SHIFTS:
+        run_mask = opp & mask
+        run = (own >> shift) & run_mask
+        for _ in range(5):
+            run |= (run >> shift) & run_mask
+        moves |= (run >> shift) & mask
+    return moves & empty
+
+
+def neighbours(bits):
+    """
+    :return: A numpy.uint64 array of the squares next to (in any of the 8 directions) the set bits of bits.
+    """
+    result = numpy.zeros_like(bits)
+    for shift, mask in _LEFT_SHIFTS:
+        result |= (bits << shift) & mask
+    for shift, mask in _RIGHT_SHIFTS:
+        result |= (bits >> shift) & mask
+    return result
+
+
+def features(positions):
+    """
+    Compute the evaluation features of every position, each one as player to move minus opponent:
+    disks on the board, legal moves, corners held and frontier disks (disks next to an empty square).
+    :param positions: A (N, 2) numpy.uint64 array, see pack.
+    :return: A (N, 4) numpy.int32 array, columns in the order of FEATURES.
+    """
+    positions = numpy.asarray(positions, dtype=numpy.uint64)
+    own = positions[:, 0]
+    opp = positions[:, 1]
+    empty = ~(own | opp)
+    next_to_empty = neighbours(empty)
+    result = numpy.empty((positions.shape[0], len(FEATURES)), dtype=numpy.int32)
+    result[:, 0] = popcount(own) - popcount(opp)
+    result[:, 1] = popcount(legal_moves(own, opp)) - popcount(legal_moves(opp, own))
+    result[:, 2] = popcount(own & _CORNERS) - popcount(opp & _CORNERS)
+    result[:, 3] = popcount(own & next_to_empty) - popcount(opp & next_to_empty)
+    return result
+
+
+def evaluate(positions, weights=DEFAULT_WEIGHTS):
+    """
+    Score every position for the player to move by a weighted sum of its features.
+    :param positions: A (N, 2) numpy.uint64 array, see pack.
+    :param weights: One weight per name of FEATURES.
+    :return: A numpy array of N scores.
+    """
+    return features(positions) @ numpy.asarray(weights)
+
+
+def flips(own, opp, moves):
+    """
+    Same as Bitboard.flips, for arrays of bitboards.
+    :param moves: A numpy.uint64 array with a single bit set per element, the square to place at.
+    :return: A numpy.uint64 array of flipped disk bitboards.
+    """
+    flipped = numpy.zeros_like(own)
+    for shift, mask in _LEFT_SHIFTS:
+        run_mask = opp & mask
+        run = (moves << shift) & run_mask
+        for _ in range(5):
+            run |= (run << shift) & run_mask
+        flipped |= numpy.where((run << shift) & mask & own, run, numpy.uint64(0))
+    for shift, mask in _RIGHT_SHIFTS:
+        run_mask = opp & mask
+        run = (moves >> shift) & run_mask
+        for _ in range(5):
+            run |= (run >> shift) & run_mask
+        flipped |= numpy.where((run >> shift) & mask & own, run, numpy.uint64(0))
+    return flipped
+
+
+def expand(positions):
+    """
+    Generate the children of every position.
+    A position where the player to move has to pass gets one child, the same board with the other player to move.
+    A position where neither player can move is terminal and gets no children.
+    :param positions: A (N, 2) numpy.uint64 array, see pack.
+    :return: A tuple (children, parents, moves, terminal).
+    children is a (M, 2) numpy.uint64 array of the children, packed like positions,
+    the children of a position are next to each other, in order of their bit index.
+    parents is a (M,) array, parents[i] is the row in positions of the parent of children[i].
+    moves is a (M,) array of the bit index played to reach each child, or PASS_MOVE.
+    terminal is a (N,) boolean array, True for the positions where the game is over.
+    """
+    positions = numpy.asarray(positions, dtype=numpy.uint64)
+    own = positions[:, 0]
+    opp = positions[:, 1]
+    legal = legal_moves(own, opp)
+    passing = legal == 0
+    terminal = passing & (legal_moves(opp, own) == 0)
+    passing &= ~terminal
+
+    # split every legal bitboard into single bits, round r takes the r-th lowest move of every position
+    parents = []
+    move_bits = []
+    remaining = legal.copy()
+    rows = numpy.flatnonzero(remaining)
+    while rows.size:
+        lowest = remaining[rows] & (~remaining[rows] + numpy.uint64(1))
+        parents.append(rows)
+        move_bits.append(lowest)
+        remaining[rows] ^= lowest
+        rows = rows[remaining[rows] != 0]
+    if parents:
+        parents = numpy.concatenate(parents)
+        move_bits = numpy.concatenate(move_bits)
+    else:
+        parents = numpy.empty(0, dtype=numpy.intp)
+        move_bits = numpy.empty(0, dtype=numpy.uint64)
+
+    parent_own = own[parents]
+    parent_opp = opp[parents]
+    flipped = flips(parent_own, parent_opp, move_bits)
+    pass_rows = numpy.flatnonzero(passing)
+
+    children = numpy.empty((parents.size + pass_rows.size, 2), dtype=numpy.uint64)
+    children[:parents.size, 0] = parent_opp ^ flipped
+    children[:parents.size, 1] = parent_own | flipped | move_bits
+    children[parents.size:, 0] = opp[pass_rows]
+    children[parents.size:, 1] = own[pass_rows]
+    moves = numpy.concatenate((popcount(move_bits - numpy.uint64(1)),
+                               numpy.full(pass_rows.size, PASS_MOVE, dtype=numpy.int32)))
+    parents = numpy.concatenate((parents, pass_rows))
+
+    # group the children by parent, the stable sort keeps each group in the order of the rounds
+    order = numpy.argsort(parents, kind="stable")
+    return children[order], parents[order], moves[order], terminal
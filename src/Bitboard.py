@@ -0,0 +1,444 @@
+"""
+Bitboard.py contains the low level board operations the Othello class is built on.
+
+Each side of the board is stored as one 64 bit integer.
+Bit (row * 8 + col) is set iff that side has a disk at (row, col),
+so the top left corner is bit 0 and the bottom right corner is bit 63.
+
+Legal move generation and disk counting are done with shift and mask
+operations that handle a whole direction of the board at once,
+instead of walking the board cell by cell.
+Flipping walks the rays of RAYS, a table of the 8 directions from every square built once at import.
+
+Positions are hashed with Zobrist keys: a fixed random 64 bit number per (color, square) and one for
+white to move, XORed together. The tables are generated from a fixed seed so keys are the same in
+every process and can be stored on disk.
+"""
+import random
+
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_FIRST_COL = 0xFEFEFEFEFEFEFEFE  # every square except column 0
+NOT_LAST_COL = 0x7F7F7F7F7F7F7F7F  # every square except column 7
+
+# (shift, mask) pairs. Shifting by a positive amount moves a disk towards higher bit indices.
+# The mask removes the disks that wrapped around from one edge of the board to the other.
+LEFT_SHIFTS = (
+    (1, NOT_FIRST_COL),  # east
+    (8, FULL),  # south
+    (9, NOT_FIRST_COL),  # south east
+    (7, NOT_LAST_COL),  # south west
+)
+RIGHT_SHIFTS = (
+    (1, NOT_LAST_COL),  # west
+    (8, FULL),  # north
+    (9, NOT_LAST_COL),  # north west
+    (7, NOT_FIRST_COL),  # north east
+)
+
+# (row, col) steps of the 8 directions a line of disks can run in.
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+INITIAL_BLACK = (1 << 28) | (1 << 35)  # (3, 4) and (4, 3)
+INITIAL_WHITE = (1 << 27) | (1 << 36)  # (3, 3) and (4, 4)
+
+
+def square(row, col):
+    """
+    :return: The bit index of position (row, col).
+    """
+    return row * 8 + col
+
+
+def position(sq):
+    """
+    :return: The (row, col) tuple of bit index sq.
+    """
+    return sq >> 3, sq & 7
+
+
+def _build_rays():
+    """
+    For every square, list the squares in each direction ordered from the nearest to the edge of the board.
+    Each square is stored as a single bit mask. Rays shorter than 2 squares are left out
+    because a capture needs at least one opponent disk followed by an own disk.
+    :return: A tuple indexed by bit index, of tuples of rays.
+    """
+    rays = []
+    for sq in range(64):
+        row, col = position(sq)
+        square_rays = []
+        for d_row, d_col in DIRECTIONS:
+            ray = []
+            tmp_row = row + d_row
+            tmp_col = col + d_col
+            while 0 <= tmp_row < 8 and 0 <= tmp_col < 8:
+                ray.append(1 << square(tmp_row, tmp_col))
+                tmp_row += d_row
+                tmp_col += d_col
+            if len(ray) >= 2:
+                square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+RAYS = _build_rays()
+
+
+def _build_zobrist():
+    """
+    :return: A tuple (keys, turn) where keys[color][sq] is the key of a color disk at sq
+    and turn[player] is the key of player being the one to move.
+    """
+    rng = random.Random(384)
+    keys = tuple(tuple(rng.getrandbits(64) for _ in range(64)) for _ in range(2))
+    turn = (0, rng.getrandbits(64))
+    return keys, turn
+
+
+ZOBRIST, ZOBRIST_TURN = _build_zobrist()
+# XOR of both colors' keys at a square, flipping a disk there changes the key by this.
+ZOBRIST_FLIP = tuple(ZOBRIST[0][sq] ^ ZOBRIST[1][sq] for sq in range(64))
+
+
+if hasattr(int, "bit_count"):
+    def popcount(bits):
+        """
+        :return: Number of set bits in bits.
+        """
+        return bits.bit_count()
+else:
+    def popcount(bits):
+        """
+        :return: Number of set bits in bits.
+        """
+        return bin(bits).count("1")
+
+
+def iter_squares(bits):
+    """
+    Iterate over the set bits of a bitboard, lowest bit index first.
+    :param bits: A bitboard.
+    :return: A generator of bit indices.
+    """
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def legal_moves(own, opp):
+    """
+    Compute every square where own can place a disk.
+    For each direction, grow the runs of opponent disks that start next to an own disk,
+    any empty square right after such a run is a legal move.
+    :param own: Bitboard of the player to move.
+    :param opp: Bitboard of the opponent.
+    :return: A bitboard with one bit set per legal move.
+    """
+    empty = ~(own | opp) & FULL
+    moves = 0
+    for shift, mask in LEFT_SHIFTS:
+        run_mask = opp & mask
+        run = (own << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        moves |= (run << shift) & mask
+    for shift, mask in RIGHT_SHIFTS:
+        run_mask = opp & mask
+        run = (own >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        moves |= (run >> shift) & mask
+    return moves & empty
+
+
+def has_legal_move(own, opp):
+    """
+    Same as legal_moves(own, opp) != 0, but returns as soon as one direction has a move.
+    Used by the terminal and pass checks, which only need to know whether a move exists.
+    :return: True iff own can place a disk somewhere.
+    """
+    empty = ~(own | opp) & FULL
+    for shift, mask in LEFT_SHIFTS:
+        run_mask = opp & mask
+        run = (own << shift) & run_mask
+        if not run:
+            continue
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        if (run << shift) & mask & empty:
+            return True
+    for shift, mask in RIGHT_SHIFTS:
+        run_mask = opp & mask
+        run = (own >> shift) & run_mask
+        if not run:
+            continue
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        if (run >> shift) & mask & empty:
+            return True
+    return False
+
+
+def flips(own, opp, sq):
+    """
+    Compute the opponent disks that would be flipped if own placed a disk at sq.
+    Walks the precomputed RAYS of sq, so no bounds are checked here.
+    :param own: Bitboard of the player to move.
+    :param opp: Bitboard of the opponent.
+    :param sq: Bit index of the square to place at, assumed to be empty.
+    :return: A bitboard of the flipped disks, 0 if the move is not legal.
+    """
+    flipped = 0
+    for ray in RAYS[sq]:
+        run = 0
+        for bit in ray:
+            if bit & opp:
+                run |= bit
+            else:
+                if bit & own:
+                    flipped |= run
+                break
+    return flipped
+
+
+def zobrist_key(black, white):
+    """
+    Compute the Zobrist key of the disks on the board from scratch.
+    The side to move is not included, XOR ZOBRIST_TURN[player] to add it.
+    :return: A 64 bit integer.
+    """
+    key = 0
+    for sq in iter_squares(black):
+        key ^= ZOBRIST[0][sq]
+    for sq in iter_squares(white):
+        key ^= ZOBRIST[1][sq]
+    return key
+
+
+def zobrist_flips(flipped):
+    """
+    :param flipped: A bitboard of disks that change color.
+    :return: The value the Zobrist key changes by when they flip.
+    """
+    key = 0
+    for sq in iter_squares(flipped):
+        key ^= ZOBRIST_FLIP[sq]
+    return key
+
+
+# (edge, corner, shift) walks along an edge of the board starting at a corner, positive shifts go towards higher bits.
+EDGES = (0x00000000000000FF, 0xFF00000000000000, 0x0101010101010101, 0x8080808080808080)
+EDGE_WALKS = (
+    (EDGES[0], 1 << 0, 1), (EDGES[0], 1 << 7, -1),
+    (EDGES[1], 1 << 56, 1), (EDGES[1], 1 << 63, -1),
+    (EDGES[2], 1 << 0, 8), (EDGES[2], 1 << 56, -8),
+    (EDGES[3], 1 << 7, 8), (EDGES[3], 1 << 63, -8),
+)
+
+
+def edge_stable(own, opp):
+    """
+    Find disks of own that can never be flipped because of the edges:
+    disks on a completely filled edge, and disks joined to an own corner by a line of own disks along an edge.
+    This is a cheap part of the stable disks, not all of them.
+    :return: A bitboard of stable disks of own.
+    """
+    stable = 0
+    taken = own | opp
+    for edge in EDGES:
+        if taken & edge == edge:
+            stable |= own & edge
+    for edge, corner, shift in EDGE_WALKS:
+        run = own & corner
+        if not run:
+            continue
+        line = own & edge
+        for _ in range(7):
+            run |= ((run << shift) if shift > 0 else (run >> -shift)) & line
+        stable |= run
+    return stable
+
+
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+X_SQUARES = (1 << 9) | (1 << 14) | (1 << 49) | (1 << 54)  # diagonally next to a corner
+
+
+def neighbours(bitboard):
+    """
+    :return: A bitboard of every square next to a square of bitboard, in any of the 8 directions.
+    """
+    result = 0
+    for shift, mask in LEFT_SHIFTS:
+        result |= (bitboard << shift) & mask
+    for shift, mask in RIGHT_SHIFTS:
+        result |= (bitboard >> shift) & mask
+    return result & FULL
+
+
+def frontier(own, opp):
+    """
+    Grow the empty squares by one square in every direction, the disks they reach are next to an empty square.
+    :return: A bitboard of the disks of own or opp next to an empty square.
+    """
+    taken = own | opp
+    empty = ~taken & FULL
+    row = empty | ((empty << 1) & NOT_FIRST_COL) | ((empty >> 1) & NOT_LAST_COL)
+    return taken & (row | (row << 8) | (row >> 8))
+
+
+def _line_ends(shift, mask, forward):
+    """
+    :return: A bitboard of the squares whose next square in the direction is off the board.
+    """
+    if forward:
+        return FULL ^ (((FULL << shift) & mask & FULL) >> shift)
+    return FULL ^ (((FULL >> shift) & mask) << shift & FULL)
+
+
+# (shift, forward mask, backward mask, forward end, backward end) for the 4 lines through a square:
+# horizontal, vertical and the 2 diagonals. The ends are the squares with no next square on that side.
+AXES = tuple((left[0], left[1], right[1], _line_ends(left[0], left[1], True), _line_ends(right[0], right[1], False))
+             for left, right in zip(LEFT_SHIFTS, RIGHT_SHIFTS))
+
+
+def full_lines(taken):
+    """
+    For each of the 4 AXES, find the squares whose whole line along that axis is taken, so no disk of the line
+    can ever be flipped along it. A line is filled from its two ends at once, one square per step.
+    :param taken: Bitboard of the taken squares.
+    :return: A list of 4 bitboards, one per axis.
+    """
+    lines = []
+    for shift, forward_mask, backward_mask, forward_end, backward_end in AXES:
+        forward = taken & forward_end  # taken squares with every square after them taken
+        backward = taken & backward_end  # same towards the other side
+        for _ in range(7):
+            forward |= taken & ((forward & forward_mask) >> shift)
+            backward |= taken & (((backward & backward_mask) << shift) & FULL)
+        lines.append(forward & backward)
+    return lines
+
+
+def stable(own, opp):
+    """
+    Find disks of own that can never be flipped. A disk is stable if along each of the 4 lines through it,
+    the line is full, or the disk is next to the edge or to a stable disk of own.
+    Starting from no stable disks, every disk meeting this is added until none is left, all of them at once each round.
+    General stability can only be decided by searching, this finds every disk the rule proves stable,
+    which includes every disk of edge_stable.
+    :return: A bitboard of stable disks of own.
+    """
+    lines = full_lines(own | opp)
+    result = 0
+    while True:
+        candidates = own & ~result
+        for (shift, forward_mask, backward_mask, forward_end, backward_end), full in zip(AXES, lines):
+            candidates &= (full | forward_end | backward_end | ((result & forward_mask) >> shift)
+                           | (((result & backward_mask) << shift) & FULL))
+            if not candidates:
+                return result
+        result |= candidates
+
+
+def potential_mobility(own, opp):
+    """
+    Empty squares next to an opponent disk, where own may be able to move later.
+    :return: A bitboard of the empty squares next to a disk of opp.
+    """
+    return neighbours(opp) & ~(own | opp) & FULL
+
+
+def flip_vertical(bitboard):
+    """
+    :return: bitboard mirrored top to bottom, row r goes to row 7 - r. Rows are bytes so this swaps the bytes.
+    """
+    bitboard = ((bitboard >> 8) & 0x00FF00FF00FF00FF) | ((bitboard & 0x00FF00FF00FF00FF) << 8)
+    bitboard = ((bitboard >> 16) & 0x0000FFFF0000FFFF) | ((bitboard & 0x0000FFFF0000FFFF) << 16)
+    return ((bitboard >> 32) & 0x00000000FFFFFFFF) | ((bitboard & 0x00000000FFFFFFFF) << 32)
+
+
+def flip_horizontal(bitboard):
+    """
+    :return: bitboard mirrored left to right, column c goes to column 7 - c. Reverses the bits of every byte.
+    """
+    bitboard = ((bitboard >> 1) & 0x5555555555555555) | ((bitboard & 0x5555555555555555) << 1)
+    bitboard = ((bitboard >> 2) & 0x3333333333333333) | ((bitboard & 0x3333333333333333) << 2)
+    return ((bitboard >> 4) & 0x0F0F0F0F0F0F0F0F) | ((bitboard & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def flip_diagonal(bitboard):
+    """
+    :return: bitboard mirrored along the diagonal through (0, 0) and (7, 7), (row, col) goes to (col, row).
+    Each step swaps groups of bits across the diagonal at once.
+    """
+    swap = 0x0F0F0F0F00000000 & (bitboard ^ (bitboard << 28))
+    bitboard ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (bitboard ^ (bitboard << 14))
+    bitboard ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (bitboard ^ (bitboard << 7))
+    return bitboard ^ swap ^ (swap >> 7)
+
+
+def symmetries(bitboard):
+    """
+    The 8 symmetries of the board (rotations and mirrors), always in the same order, identity first.
+    :return: A list of 8 bitboards.
+    """
+    vertical = flip_vertical(bitboard)
+    images = [bitboard, flip_horizontal(bitboard), vertical, flip_horizontal(vertical)]
+    return images + [flip_diagonal(image) for image in images]
+
+
+def canonical(black, white):
+    """
+    Pick one position among the 8 symmetric copies of (black, white): the one with the smallest (black, white),
+    so every symmetric copy of a position has the same canonical position.
+    :return: A tuple (black, white, symmetry), symmetry is the index in symmetries of the canonical copy.
+    """
+    best = None
+    for symmetry, (image_black, image_white) in enumerate(zip(symmetries(black), symmetries(white))):
+        if best is None or (image_black, image_white) < best[:2]:
+            best = (image_black, image_white, symmetry)
+    return best
+
+
+def from_board(board):
+    """
+    Convert a nested list board (0 for black, 1 for white, None for empty) into bitboards.
+    :return: A tuple (black, white).
+    """
+    black = 0
+    white = 0
+    for row in range(8):
+        for col in range(8):
+            if board[row][col] == 0:
+                black |= 1 << square(row, col)
+            elif board[row][col] == 1:
+                white |= 1 << square(row, col)
+    return black, white
+
+
+def to_board(black, white):
+    """
+    Convert bitboards into a nested list board (0 for black, 1 for white, None for empty).
+    :return: A new 8 by 8 nested list.
+    """
+    board = [[None] * 8 for _ in range(8)]
+    for sq in iter_squares(black):
+        board[sq >> 3][sq & 7] = 0
+    for sq in iter_squares(white):
+        board[sq >> 3][sq & 7] = 1
+    return board
@@ -1,13 +1,154 @@
 """
 Engine.py is an search engine that allow different configuration of the search to be
 created and completed by 'AI'
+
+SearchEngine.run makes a move with the chosen strategy and measures the search that found it:
+nodes visited per depth, cutoffs, transposition table hits, effective branching factor,
+wall and CPU time and peak memory, returned as a SearchStats.
+
+The counting is done by subclasses of the search classes of Algorithms.py that are only used by the engine,
+and by the count function minmax takes, so the searches run by everything else do not pay for it.
 """
+import time
+import tracemalloc
+import Algorithms
+import Bitboard
+import GameRecord
+import Transposition
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+STRATEGIES = ("random", "most_eliminate", "minmax", "alphabeta", "iterative", "endgame", "mcts")
+
+
+class SearchStats:
+    """
+    Measurements of one search. nodes_by_depth maps the number of plies from the root to the nodes visited there,
+    for the mcts strategy to the nodes of its tree. playouts is the number of random games the mcts strategy played.
+    effective_branching_factor is the branching factor of a uniform tree with as many nodes and the same depth.
+    peak_memory_kb is the peak resident memory of the process, traced_peak_bytes is the peak memory
+    allocated by Python during the search, only measured when the engine tracks memory.
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.move = None
+        self.score = None
+        self.depth = 0
+        self.nodes = 0
+        self.nodes_by_depth = {}
+        self.playouts = 0
+        self.cutoffs = 0
+        self.table_hits = 0
+        self.table_misses = 0
+        self.effective_branching_factor = 0.0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_kb = None
+        self.traced_peak_bytes = None
+        self.finished = False
+
+    def count(self, ply):
+        self.nodes_by_depth[ply] = self.nodes_by_depth.get(ply, 0) + 1
+
+    def update(self):
+        """
+        Derive the totals from the per depth counts.
+        """
+        self.nodes = sum(self.nodes_by_depth.values())
+        if self.nodes_by_depth:
+            self.depth = max(self.depth, max(self.nodes_by_depth))
+        if self.depth > 0 and self.nodes > 0:
+            self.effective_branching_factor = self.nodes ** (1.0 / self.depth)
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class InstrumentedAlphaBeta(Algorithms.AlphaBeta):
+    """
+    AlphaBeta that counts the nodes of every depth into a SearchStats.
+    """
+
+    def __init__(self, stats, callback=None, callback_seconds=0.5, **options):
+        Algorithms.AlphaBeta.__init__(self, **options)
+        self.stats = stats
+        self.callback = callback
+        self.callback_seconds = callback_seconds
+        self.root_depth = 0
+        self.next_callback = time.perf_counter() + callback_seconds
+
+    def search_root(self, game, depth, root_order=None):
+        self.root_depth = depth
+        if depth > 0 and game.legal_moves():
+            self.stats.count(0)
+        result = Algorithms.AlphaBeta.search_root(self, game, depth, root_order)
+        self.stats.depth = depth
+        if self.callback is not None:
+            self.stats.update()
+            self.callback(self.stats)
+        return result
+
+    def negamax(self, game, depth, alpha, beta):
+        self.stats.count(self.root_depth - depth)
+        return Algorithms.AlphaBeta.negamax(self, game, depth, alpha, beta)
+
+    def interrupted(self):
+        if self.callback is not None and time.perf_counter() >= self.next_callback:
+            self.next_callback = time.perf_counter() + self.callback_seconds
+            self.stats.update()
+            self.callback(self.stats)
+        return Algorithms.AlphaBeta.interrupted(self)
+
+
+class InstrumentedEndgameSolver(Algorithms.EndgameSolver):
+    """
+    EndgameSolver that counts the nodes of every depth into a SearchStats, a depth is one square filled.
+    """
+
+    def __init__(self, stats):
+        Algorithms.EndgameSolver.__init__(self)
+        self.stats = stats
+        self.root_empties = 0
+
+    def solve_window(self, game, alpha, beta):
+        self.root_empties = 64 - Bitboard.popcount(game.bitboards[0] | game.bitboards[1])
+        if game.legal_moves():
+            self.stats.count(0)
+        return Algorithms.EndgameSolver.solve_window(self, game, alpha, beta)
+
+    def search(self, own, opp, alpha, beta):
+        self.stats.count(self.root_empties - 64 + Bitboard.popcount(own | opp))
+        return Algorithms.EndgameSolver.search(self, own, opp, alpha, beta)
 
 
 class SearchEngine:
 
-    def __init__(self, strategy='random'):
+    def __init__(self, strategy='random', depth=3, time_limit_ms=1000, table=None, callback=None,
+                 track_memory=False, iterations=1000):
+        """
+        :param strategy: One of STRATEGIES.
+        :param depth: Search depth of the minmax and alphabeta strategies.
+        :param time_limit_ms: Time limit of the iterative and mcts strategies.
+        :param table: Optional Transposition.TranspositionTable used by the minmax, alphabeta and iterative strategies.
+        :param callback: Optional function called with the SearchStats while searching (after every iteration
+        and about twice a second for the alphabeta and iterative strategies) and once when the search is done.
+        :param track_memory: Also trace the peak memory allocated during the search with tracemalloc,
+        which makes the search a lot slower.
+        :param iterations: Number of playouts of the mcts strategy, it stops at the time limit if that comes first.
+        The tree of the mcts strategy is kept in tree and reused by the next run.
+        """
         self.strategy = strategy
+        self.depth = depth
+        self.time_limit_ms = time_limit_ms
+        self.table = table
+        self.callback = callback
+        self.track_memory = track_memory
+        self.iterations = iterations
+        self.tree = Algorithms.MonteCarlo()
 
     def set_strategy(self, strategy):
         self.strategy = strategy
@@ -15,6 +156,109 @@ class SearchEngine:
     def get_strategy(self):
         return self.strategy
 
+    def run(self, game):
+        """
+        Make a move with the strategy of the engine and measure the search.
+        :param game: A Othello instance, it is not changed.
+        :return: A tuple (next_game, stats), next_game is an Othello instance with the move made,
+        stats is a SearchStats.
+        """
+        if self.strategy not in STRATEGIES:
+            raise ValueError(str.format("Unknown strategy {0}", self.strategy))
+        stats = SearchStats(self.strategy)
+        if self.track_memory:
+            tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            next_game = self.run_strategy(game, stats)
+        finally:
+            stats.wall_seconds = time.perf_counter() - wall_start
+            stats.cpu_seconds = time.process_time() - cpu_start
+            if self.track_memory:
+                stats.traced_peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        if resource is not None:
+            stats.peak_memory_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stats.update()
+        stats.finished = True
+        if self.callback is not None:
+            self.callback(stats)
+        return next_game, stats
+
+    def run_strategy(self, game, stats):
+        """
+        :return: The game after the move of the strategy, filling stats along the way.
+        """
+        game = game.clone()
+        if self.strategy in ("random", "most_eliminate"):
+            stats.count(0)
+            for _ in Bitboard.iter_squares(game.legal_moves()):
+                stats.count(1)
+            if self.strategy == "random":
+                next_game = Algorithms.random(game)
+            else:
+                next_game = Algorithms.most_eliminate(game)
+            stats.move = self.placed(game, next_game)
+            return next_game
+
+        if self.strategy == "minmax":
+            depth = self.depth
+
+            def count(remaining):
+                stats.count(depth + 1 - remaining)
+            table = self.table
+            hits = table.hits if table is not None else 0
+            misses = table.misses if table is not None else 0
+            stats.count(0)
+            next_game = Algorithms.minmax_move(game, depth, game.current_player == 1, table, count=count)
+            if table is not None:
+                stats.table_hits = table.hits - hits
+                stats.table_misses = table.misses - misses
+            stats.move = self.placed(game, next_game)
+            return next_game
+
+        if self.strategy == "endgame":
+            square, stats.score = InstrumentedEndgameSolver(stats).solve(game)
+        elif self.strategy == "mcts":
+            tree = self.tree
+            square = tree.search(game, self.iterations, self.time_limit_ms)
+            stats.playouts = tree.playouts
+            # parents come before their children in the arrays
+            depths = [0] * len(tree.visits)
+            for node in range(1, len(depths)):
+                depths[node] = depths[tree.parents[node]] + 1
+            for ply in depths:
+                stats.count(ply)
+        else:
+            table = self.table if self.table is not None else Transposition.TranspositionTable()
+            hits = table.hits
+            misses = table.misses
+            search = InstrumentedAlphaBeta(stats, self.callback, table=table)
+            if self.strategy == "alphabeta":
+                square, stats.score = search.search(game, self.depth)
+            else:
+                square, stats.score, stats.depth = search.iterative_deepening(game, self.time_limit_ms)
+            stats.cutoffs = search.cutoffs
+            stats.table_hits = table.hits - hits
+            stats.table_misses = table.misses - misses
+        stats.move = None if square is None else Bitboard.position(square)
+        if square is None:
+            game.make_move(None)
+        else:
+            game.make_square(square)
+        return game
+
+    @staticmethod
+    def placed(game, next_game):
+        """
+        :return: The (row, col) of the piece placed between game and next_game, None if the player passed.
+        """
+        move = GameRecord.played_move(game, next_game)
+        if move == GameRecord.PASS_MOVE:
+            return None
+        return Bitboard.position(move)
+
     def search(self, init_state, goal_function, heuristic_function):
         """
         :param init_state: The initial state
@@ -23,4 +267,4 @@ class SearchEngine:
         :return: Return the goal, or False if search was not able to find such goal.
         """
         if goal_function(init_state) == init_state.current_player:  # if goal_function returns the winner
-            return init_state
\ No newline at end of file
+            return init_state
@@ -0,0 +1,170 @@
+"""
+GameRecord.py stores played games in a compact binary file: one byte per move instead of printed boards.
+
+GameRecordWriter appends games to a file one at a time, read_records reads them back one at a time,
+so neither ever holds more than one game in memory, however large the file is.
+
+File format, all numbers little endian:
+header: MAGIC (8 bytes)
+records, one per game: the length of the rest of the record (uint32), then
+result, the final lead in pieces of white over black (int8), length of the black player name (uint8),
+length of the white player name (uint8), number of moves (uint16), nodes searched (uint64),
+search time in milliseconds (uint32), the black and white player names (UTF-8) and the moves, one byte each.
+A move is the bit index of the square played (see Bitboard.py), or PASS_MOVE for a pass.
+Games are played from the initial board, white first, so the moves are enough to replay them.
+The length prefix lets a reader skip a record without decoding it.
+
+Example:
+with GameRecordWriter("games.bin") as writer:
+    writer.write(GameRecord(moves, result, "alphabeta_move", "random"))
+for record in read_records("games.bin"):
+    print(record.black, record.white, record.result, len(record.moves))
+"""
+import struct
+import Bitboard
+import Othello
+import Transposition
+
+MAGIC = b"OTHGAME1"
+LENGTH = struct.Struct("<I")
+RECORD = struct.Struct("<bBBHQI")
+PASS_MOVE = Transposition.PASS_MOVE
+
+
+def played_move(game, next_game):
+    """
+    :param game: A Othello instance.
+    :param next_game: The Othello instance after one move of game.
+    :return: The bit index of the square played between them, or PASS_MOVE.
+    """
+    placed = (next_game.bitboards[0] | next_game.bitboards[1]) & ~(game.bitboards[0] | game.bitboards[1])
+    if not placed:
+        return PASS_MOVE
+    return placed.bit_length() - 1
+
+
+class GameRecord:
+    """
+    One played game. moves is a bytes object with one move per byte.
+    """
+    __slots__ = ("moves", "result", "black", "white", "nodes", "milliseconds")
+
+    def __init__(self, moves, result, black="", white="", nodes=0, milliseconds=0):
+        """
+        :param moves: The moves of the game, bit indices or PASS_MOVE, as bytes or a list of ints.
+        :param result: The final lead in pieces of white over black.
+        :param black: Name of the black player.
+        :param white: Name of the white player.
+        :param nodes: Number of nodes the players searched during the game.
+        :param milliseconds: Time the players spent searching.
+        """
+        moves = bytes(moves)
+        if max(moves, default=0) > PASS_MOVE:
+            raise ValueError("A move has to be a bit index or PASS_MOVE")
+        self.moves = moves
+        self.result = result
+        self.black = black
+        self.white = white
+        self.nodes = nodes
+        self.milliseconds = milliseconds
+
+    def replay(self):
+        """
+        Play the moves from the initial board.
+        The same Othello instance is yielded after every move, clone it to keep a position.
+        :return: A generator of (game, move) tuples, game is the position after move.
+        :raise ValueError: If a move is not legal in the position it is played from.
+        """
+        game = Othello.Othello()
+        game.initialize_board()
+        for number, move in enumerate(self.moves):
+            if move == PASS_MOVE:
+                if not game.must_pass():
+                    raise ValueError(str.format("Move {0} is a pass but the player can move or the game is over",
+                                                number))
+                game.make_move(None)
+            else:
+                if not game.legal_moves() >> move & 1:
+                    raise ValueError(str.format("Move {0} to {1} is not legal", number, Bitboard.position(move)))
+                game.make_square(move)
+            yield game, move
+
+    def __eq__(self, other):
+        if not isinstance(other, GameRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in GameRecord.__slots__)
+
+
+class GameRecordWriter:
+    """
+    Writes game records to a file, use it as a context manager or call close() when done.
+    """
+
+    def __init__(self, path, append=False):
+        """
+        :param path: The file to write.
+        :param append: Add the games to the end of an existing game record file instead of replacing it.
+        """
+        self.file = open(path, "ab" if append else "wb")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        else:
+            with open(path, "rb") as existing:
+                if existing.read(len(MAGIC)) != MAGIC:
+                    self.file.close()
+                    raise ValueError(str.format("{0} is not a game record file", path))
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record):
+        """
+        :param record: A GameRecord.
+        :return: Nothing
+        """
+        black = record.black.encode("utf-8")
+        white = record.white.encode("utf-8")
+        header = RECORD.pack(record.result, len(black), len(white), len(record.moves), record.nodes,
+                             record.milliseconds)
+        self.file.write(LENGTH.pack(len(header) + len(black) + len(white) + len(record.moves)))
+        self.file.write(header)
+        self.file.write(black)
+        self.file.write(white)
+        self.file.write(record.moves)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_records(path):
+    """
+    Read the games of a game record file one at a time.
+    :param path: The file to read.
+    :return: A generator of GameRecord.
+    :raise ValueError: If the file is not a game record file or its last record is cut short.
+    """
+    with open(path, "rb") as record_file:
+        if record_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(str.format("{0} is not a game record file", path))
+        while True:
+            prefix = record_file.read(LENGTH.size)
+            if not prefix:
+                return
+            if len(prefix) != LENGTH.size:
+                raise ValueError(str.format("{0} ends in the middle of a record", path))
+            length = LENGTH.unpack(prefix)[0]
+            data = record_file.read(length)
+            if len(data) != length or length < RECORD.size:
+                raise ValueError(str.format("{0} ends in the middle of a record", path))
+            result, black_length, white_length, move_count, nodes, milliseconds = RECORD.unpack_from(data, 0)
+            start = RECORD.size
+            black = data[start:start + black_length].decode("utf-8")
+            start += black_length
+            white = data[start:start + white_length].decode("utf-8")
+            start += white_length
+            yield GameRecord(data[start:start + move_count], result, black, white, nodes, milliseconds)
@@ -0,0 +1,142 @@
+"""
+OpeningBook.py contains an opening book: the best moves of the first positions of the game, searched in advance.
+
+build() searches every position reachable in the first few moves and writes the results to a file.
+OpeningBook reads the file through mmap, so opening it costs no parsing and
+every process using the same file shares the same pages of memory.
+
+File format, all numbers little endian:
+header: MAGIC (8 bytes), number of records (uint32), plies the book was built for (uint32)
+records: key (uint64), score (int32), move (uint8), depth (uint8), 14 bytes each.
+Records are sorted by key, and by score from best to worst for the same key,
+so the records of a position are found by binary search.
+The key is the Zobrist key of the position (see Othello.key), the move is a bit index (see Bitboard.py)
+and the score is from the point of view of the player to move. Scores of finished games include
+Algorithms.WIN_SCORE, so they do not fit in 16 bits.
+"""
+import mmap
+import struct
+import Algorithms
+import Bitboard
+import Othello
+import Transposition
+
+MAGIC = b"OTHBOOK2"
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<QiBB")
+KEY = struct.Struct("<Q")
+
+
+def opening_positions(plies, start=None):
+    """
+    Collect every position reachable from the initial board within plies moves.
+    Positions reached through different move orders are only kept once.
+    :param start: An Othello instance to start from instead of the initial board.
+    :return: A list of Othello instances, in the order they were first reached.
+    """
+    if start is None:
+        game = Othello.Othello()
+        game.initialize_board()
+    else:
+        game = start.clone()
+    positions = {game.key: game}
+    layer = [game]
+    for _ in range(plies):
+        next_layer = []
+        for position in layer:
+            for child in position.successors():
+                if child.key not in positions:
+                    positions[child.key] = child
+                    next_layer.append(child)
+        layer = next_layer
+    return list(positions.values())
+
+
+def build(path, plies=6, depth=8, moves_per_position=3, table_mb=64, start=None):
+    """
+    Search the opening positions and write the book file.
+    Each move of a position is searched with a full window so its score is exact.
+    :param path: The file to write.
+    :param plies: Positions up to this many moves from the initial board are in the book.
+    :param depth: Search depth of every move, including the move itself.
+    :param moves_per_position: How many of the best moves to keep per position.
+    :param table_mb: Memory budget of the transposition table shared by all the searches.
+    :param start: An Othello instance to build the book from instead of the initial board.
+    :return: The number of records written.
+    """
+    search = Algorithms.AlphaBeta(table=Transposition.TranspositionTable(table_mb))
+    records = []
+    for game in opening_positions(plies, start):
+        scored = []
+        for sq in Bitboard.iter_squares(game.legal_moves()):
+            record = game.make_square(sq)
+            scored.append((-search.negamax(game, depth - 1, -Algorithms.INFINITY, Algorithms.INFINITY), sq))
+            game.unmake_move(record)
+        scored.sort(key=lambda item: item[0], reverse=True)
+        for score, sq in scored[:moves_per_position]:
+            records.append((game.key, -score, sq, depth))
+    records.sort()  # by key, then best score first because the score is negated
+    with open(path, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, len(records), plies))
+        for key, negated_score, sq, record_depth in records:
+            book_file.write(RECORD.pack(key, -negated_score, sq, record_depth))
+    return len(records)
+
+
+class OpeningBook:
+    """
+    A read only, memory mapped opening book file.
+    Use it as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self.plies = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + self.size * RECORD.size:
+            self.data.close()
+            raise ValueError(str.format("{0} is not an opening book file", path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self.data.close()
+
+    def lookup(self, key):
+        """
+        :param key: The Zobrist key of a position (Othello.key).
+        :return: A list of (square, score, depth) tuples, best move first. Empty if the position is not in the book.
+        """
+        low = 0
+        high = self.size
+        while low < high:  # find the first record with a key not below key
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, HEADER.size + middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        while low < self.size:
+            record_key, score, sq, depth = RECORD.unpack_from(self.data, HEADER.size + low * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((sq, score, depth))
+            low += 1
+        return moves
+
+    def best_move(self, game):
+        """
+        :param game: A Othello instance.
+        :return: The bit index of the best book move of game, or None if the position is not in the book.
+        """
+        moves = self.lookup(game.key)
+        if not moves:
+            return None
+        return moves[0][0]
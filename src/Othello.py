@@ -1,7 +1,8 @@
 """
 Othello.py is a class that represent the game Othello.
 
-Othello contains a 8x8 board represented by a nested list.
+Othello stores the 8x8 board as two bitboards, one 64 bit integer per color (see Bitboard.py).
+The board can still be read and written as a nested list.
 The list is filled with 0, 1, None.
 where 0 represents black pieces,
 1 represents white pieces,
@@ -11,12 +12,76 @@ Othello class is able to determine if the game has ended or not.
 
 When playing Othello, by default the white player play first.
 """
-import copy
+import Bitboard
+
+
+class Position:
+    """
+    A compact, immutable position: the black and white bitboards and the player to move, nothing else.
+    Positions are hashable and compare by value, so they can be dictionary keys and set members.
+    Use Othello to play moves, and Position to keep many positions around.
+    """
+    __slots__ = ("black", "white", "current_player")
+
+    def __init__(self, black, white, current_player=1):
+        object.__setattr__(self, "black", black)
+        object.__setattr__(self, "white", white)
+        object.__setattr__(self, "current_player", current_player)
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        :param game: A Othello instance.
+        :return: The Position of game.
+        """
+        return cls(game.bitboards[0], game.bitboards[1], game.current_player)
+
+    def to_game(self):
+        """
+        :return: A new Othello instance of this position.
+        """
+        return Othello.from_bitboards(self.black, self.white, self.current_player)
+
+    @property
+    def key(self):
+        """
+        :return: The Zobrist key of the position, the same as Othello.key.
+        """
+        return Bitboard.zobrist_key(self.black, self.white) ^ Bitboard.ZOBRIST_TURN[self.current_player]
+
+    def canonical(self):
+        """
+        :return: The canonical Position of the 8 symmetric copies of this one, see Bitboard.canonical.
+        """
+        black, white = Bitboard.canonical(self.black, self.white)[:2]
+        return Position(black, white, self.current_player)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Position is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Position):
+            return NotImplemented
+        return self.black == other.black and self.white == other.white and self.current_player == other.current_player
+
+    def __hash__(self):
+        return hash((self.black, self.white, self.current_player))
+
+    def __reduce__(self):
+        return Position, (self.black, self.white, self.current_player)
+
+    def __repr__(self):
+        return str.format("Position(0x{0:016x}, 0x{1:016x}, {2})", self.black, self.white, self.current_player)
 
 
 class Othello:
     """
-    The game board will be represented by a 8 by 8 grid. Using a nested list.
+    The game board is stored as two bitboards, self.bitboards[0] for black and self.bitboards[1] for white.
+    Bit (row * 8 + col) of a bitboard is set iff that color has a piece at (row, col).
+    The board property exposes the same board as a 8 by 8 nested list.
     Each blank is either 0 for black piece, 1 for white piece, or None for empty
     Example:
     the initial board of Othello would be
@@ -32,15 +97,98 @@ class Othello:
     ]
     """
 
-    def __init__(self, board=[[None]*8]*8, current_player=1):
-        self.board = copy.deepcopy(board)
+    def __init__(self, board=None, current_player=1):
+        self.bitboards = [0, 0]
+        self._key = 0  # Zobrist key of the disks, see the key property
+        # kept up to date by make_move/unmake_move, see count_disks and count_empty
+        self.disks = [0, 0]
+        self.empties = 64
+        # legal moves of the last (own, opp) bitboards legal_moves was asked about
+        self._moves_own = -1
+        self._moves_opp = -1
+        self._moves = 0
+        if board is not None:
+            self.board = board
         self.current_player = current_player  # white player starts first
 
+    @classmethod
+    def from_bitboards(cls, black, white, current_player=1):
+        """
+        Build a game directly from bitboards, without going through a nested list.
+        """
+        game = cls()
+        game.bitboards = [black, white]
+        game._key = Bitboard.zobrist_key(black, white)
+        game._update_features()
+        game.current_player = current_player
+        return game
+
+    @property
+    def board(self):
+        """
+        :return: A new 8 by 8 nested list of the current board.
+        Changing the returned list does not change the game, assign to board instead.
+        """
+        return Bitboard.to_board(self.bitboards[0], self.bitboards[1])
+
+    @board.setter
+    def board(self, board):
+        black, white = Bitboard.from_board(board)
+        self.bitboards = [black, white]
+        self._key = Bitboard.zobrist_key(black, white)
+        self._update_features()
+
+    def _update_features(self):
+        """
+        Compute the incrementally kept counts from scratch, after the bitboards were set.
+        """
+        self.disks = [Bitboard.popcount(self.bitboards[0]), Bitboard.popcount(self.bitboards[1])]
+        self.empties = 64 - self.disks[0] - self.disks[1]
+
+    @property
+    def key(self):
+        """
+        The 64 bit Zobrist key of the position, including the player to move.
+        The disk part is updated incrementally by make_move, only the placed and flipped disks are XORed in.
+        Bitboards should only be changed through make_move/unmake_move or the board property to keep it right.
+        """
+        return self._key ^ Bitboard.ZOBRIST_TURN[self.current_player]
+
     def initialize_board(self):
-        self.board[3][3] = 1
-        self.board[3][4] = 0
-        self.board[4][3] = 0
-        self.board[4][4] = 1
+        middle = Bitboard.INITIAL_BLACK | Bitboard.INITIAL_WHITE
+        self.bitboards[0] = (self.bitboards[0] & ~middle) | Bitboard.INITIAL_BLACK
+        self.bitboards[1] = (self.bitboards[1] & ~middle) | Bitboard.INITIAL_WHITE
+        self._key = Bitboard.zobrist_key(self.bitboards[0], self.bitboards[1])
+        self._update_features()
+
+    def legal_moves(self):
+        """
+        The result is cached until the bitboards or the player to move change,
+        so the terminal checks and the move loop of the same position only generate the moves once.
+        :return: A bitboard with one bit set for each position current_player can place a piece at.
+        """
+        own = self.bitboards[self.current_player]
+        opp = self.bitboards[1 - self.current_player]
+        if own != self._moves_own or opp != self._moves_opp:
+            self._moves = Bitboard.legal_moves(own, opp)
+            self._moves_own = own
+            self._moves_opp = opp
+        return self._moves
+
+    def must_pass(self):
+        """
+        :return: True iff current_player has no move but the opponent has one.
+        """
+        return not self.legal_moves() and Bitboard.has_legal_move(self.bitboards[1 - self.current_player],
+                                                                   self.bitboards[self.current_player])
+
+    def is_terminal(self):
+        """
+        Same as is_game_over. It does not change the game and does not print.
+        :return: True iff neither player can move.
+        """
+        return not self.legal_moves() and not Bitboard.has_legal_move(self.bitboards[1 - self.current_player],
+                                                                       self.bitboards[self.current_player])
 
     def successors(self):
         """
@@ -48,18 +196,26 @@ class Othello:
         :return: return a list where each element in the list is a Othello instance representing possible next state.
         """
         successors = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                if type(self.board[row][col]) != int:  # an empty spot
-                    if self.valid_position((row, col)):
-
-                        # Construct an instance of Othello and add to successors
-                        new_state = Othello(self.board, self.current_player)
-                        new_state.place_piece((row, col))
-                        successors.append(new_state)
+        for sq in Bitboard.iter_squares(self.legal_moves()):
+            # Construct an instance of Othello and add to successors
+            new_state = self.clone()
+            new_state.make_square(sq)
+            successors.append(new_state)
 
         return successors
 
+    def iter_moves(self):
+        """
+        Lazily generate the moves current player can make, without building the next states.
+        :return: A generator of (position, flipped, flip_count) tuples, where position is a tuple (row, col),
+        flipped is a bitboard of the opponent pieces the move flips and flip_count is how many there are.
+        """
+        own = self.bitboards[self.current_player]
+        opp = self.bitboards[1 - self.current_player]
+        for sq in Bitboard.iter_squares(Bitboard.legal_moves(own, opp)):
+            flipped = Bitboard.flips(own, opp, sq)
+            yield Bitboard.position(sq), flipped, Bitboard.popcount(flipped)
+
     def switch_turn(self):
         """
         Switch turns between players.
@@ -74,72 +230,23 @@ class Othello:
         :param pos: A tuple where pos[0] is row and pos[1] is col of the board.
         :return: True iff we can place current_player's piece at position pos.
         """
-        opponent = self.switch_turn()
-        row = pos[0]
-        col = pos[1]
-
-        # check right side of the pos
-        if col < 6:
-            tmp_col = col + 1
-            while tmp_col < 7:
-                if self.board[row][tmp_col] == opponent:
-                    tmp_col += 1
-                else:
-                    break
-            if tmp_col < 8 and tmp_col != col + 1 and self.board[row][tmp_col] == self.current_player:
-                return True
-
-        # check left side of the pos
-        if col > 1:
-            tmp_col = col - 1
-            while tmp_col > 0:
-                if self.board[row][tmp_col] == opponent:
-                    tmp_col -= 1
-                else:
-                    break
-            if tmp_col > -1 and tmp_col != col - 1 and self.board[row][tmp_col] == self.current_player:
-                return True
-
-        # check top side of the pos
-        if row > 1:
-            tmp_row = row - 1
-            while tmp_row > 0:
-                if self.board[tmp_row][col] == opponent:
-                    tmp_row -= 1
-                else:
-                    break
-            if tmp_row > -1 and tmp_row != row - 1 and self.board[tmp_row][col] == self.current_player:
-                return True
-
-        # check bottom side of the pos
-        if row < 6:
-            tmp_row = row + 1
-            while tmp_row < 7:
-                if self.board[tmp_row][col] == opponent:
-                    tmp_row += 1
-                else:
-                    break
-            if tmp_row < 8 and tmp_row != row + 1 and self.board[tmp_row][col] == self.current_player:
-                return True
-        return False
+        sq = Bitboard.square(pos[0], pos[1])
+        own = self.bitboards[self.current_player]
+        opp = self.bitboards[1 - self.current_player]
+        if (own | opp) >> sq & 1:  # the spot is taken
+            return False
+        return Bitboard.flips(own, opp, sq) != 0
 
     def is_game_over(self):
         """
         Check game ending conditions.
         Game is over when all the empty space has been filled.
         Or neither players can make a valid move.
+        The game is not changed, call print_board to show the final board.
         :return: True iff game is over.
         """
 
-        if not self.successors():  # if list is empty.
-            # pass turn to opponent to see if neither has possible move.
-            self.current_player = self.switch_turn()
-            if not self.successors():
-                print("Game Over!")
-                self.print_board()
-                return True   # Game ended with no more possible move
-            self.current_player = self.switch_turn()  # switch player back
-        return False
+        return self.is_terminal()
 
     def get_winner(self):
         """
@@ -147,11 +254,13 @@ class Othello:
         or None if game is not over yet.
         """
 
-        if self.is_game_over():
-            if self.count_disks(0) > self.count_disks(1):
-                return 1
-            elif self.count_disks(0) < self.count_disks(1):
+        if self.is_terminal():
+            black = self.count_disks(0)
+            white = self.count_disks(1)
+            if black > white:
                 return 0
+            elif black < white:
+                return 1
             return "Tie Game"  # Tie game
         return None  # no winner yet
 
@@ -161,12 +270,54 @@ class Othello:
         :return: number of color pieces on current board.
         """
 
-        count = 0
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                if self.board[row][col] == color:
-                    count += 1
-        return count
+        return self.disks[color]
+
+    def count_empty(self):
+        """
+        :return: number of empty squares on current board.
+        """
+        return self.empties
+
+    def count_frontier(self, color):
+        """
+        Computed from the bitboards with a few shifts, which costs less than keeping it up to date on every move.
+        :return: number of color pieces next to an empty square, the pieces that can still be outflanked soon.
+        """
+        return Bitboard.popcount(Bitboard.frontier(self.bitboards[0], self.bitboards[1]) & self.bitboards[color])
+
+    def count_corners(self, color):
+        """
+        :return: number of corners taken by color.
+        """
+        return Bitboard.popcount(self.bitboards[color] & Bitboard.CORNERS)
+
+    def count_x_squares(self, color):
+        """
+        :return: number of squares diagonally next to a corner taken by color.
+        """
+        return Bitboard.popcount(self.bitboards[color] & Bitboard.X_SQUARES)
+
+    def count_stable(self, color):
+        """
+        :return: number of color pieces that can never be flipped, see Bitboard.stable.
+        """
+        return Bitboard.popcount(Bitboard.stable(self.bitboards[color], self.bitboards[1 - color]))
+
+    def count_potential_mobility(self, color):
+        """
+        :return: number of empty squares next to a piece of the opponent of color.
+        """
+        return Bitboard.popcount(Bitboard.potential_mobility(self.bitboards[color], self.bitboards[1 - color]))
+
+    def score_bounds(self):
+        """
+        Bound the final lead in pieces of current_player with the stable pieces of both colors:
+        stable pieces keep their color until the end of the game.
+        :return: A tuple (lower, upper).
+        """
+        own = self.count_stable(self.current_player)
+        opp = self.count_stable(1 - self.current_player)
+        return 2 * own - 64, 64 - 2 * opp
 
     def place_piece(self, position):
         """
@@ -176,82 +327,101 @@ class Othello:
         :return: Nothing
         """
 
+        self.make_move(position)
+
+    def make_move(self, position):
+        """
+        Place a piece of current player's color in place and return what is needed to take it back.
+        :param position: A tuple (row, col), or None to pass the turn without placing a piece.
+        :return: An undo record (square, flipped, previous_player, previous_key) to give to unmake_move.
+        square is the bit index of the placed piece (None for a pass),
+        flipped is a bitboard of the opponent pieces that were flipped.
+        """
+
+        if position is None:
+            player = self.current_player
+            self.current_player = 1 - player
+            return None, 0, player, self._key
         row = position[0]
         col = position[1]
-        opponent = self.switch_turn()
-        if not self.valid_position(position):
-            raise ValueError(str.format("The position trying to place was not acceptable row:{0} col:{1}", row, col))
-
-        self.board[row][col] = self.current_player  # place down the piece
-
-        # Change the color of opponent that's in between
-        # check right side of the pos
-        if col < 6:
-            tmp_col = col + 1
-            while tmp_col < 7:
-                if self.board[row][tmp_col] == opponent:
-                    tmp_col += 1
-                else:
-                    break
-            if tmp_col < 8 and tmp_col != col + 1 and self.board[row][tmp_col] == self.current_player:
-                for index in range(col + 1, tmp_col):
-                    self.board[row][index] = self.current_player
-
-        # check left side of the pos
-        if col > 1:
-            tmp_col = col - 1
-            while tmp_col > 0:
-                if self.board[row][tmp_col] == opponent:
-                    tmp_col -= 1
-                else:
-                    break
-            if tmp_col > -1 and tmp_col != col - 1 and self.board[row][tmp_col] == self.current_player:
-                for index in range(tmp_col + 1, col):
-                    self.board[row][index] = self.current_player
-
-        # check top side of the pos
-        if row > 1:
-            tmp_row = row - 1
-            while tmp_row > 0:
-                if self.board[tmp_row][col] == opponent:
-                    tmp_row -= 1
-                else:
-                    break
-            if tmp_row > -1 and tmp_row != row - 1 and self.board[tmp_row][col] == self.current_player:
-                for index in range(tmp_row + 1, row):
-                    self.board[index][col] = self.current_player
-
-        # check bottom side of the pos
-        if row < 6:
-            tmp_row = row + 1
-            while tmp_row < 7:
-                if self.board[tmp_row][col] == opponent:
-                    tmp_row += 1
-                else:
-                    break
-            if tmp_row < 8 and tmp_row != row + 1 and self.board[tmp_row][col] == self.current_player:
-                for index in range(row + 1, tmp_row):
-                    self.board[index][col] = self.current_player
+        sq = Bitboard.square(row, col)
+        if not (self.bitboards[0] | self.bitboards[1]) >> sq & 1:
+            record = self.make_square(sq)
+            if record[1]:
+                return record
+            self.unmake_move(record)
+        raise ValueError(str.format("The position trying to place was not acceptable row:{0} col:{1}", row, col))
+
+    def make_square(self, sq):
+        """
+        Same as make_move but takes the bit index of an empty square and does not check the move is legal.
+        Search algorithms use it with squares from legal_moves().
+        :return: An undo record for unmake_move.
+        """
+        player = self.current_player
+        own = self.bitboards[player]
+        opp = self.bitboards[1 - player]
+        flipped = Bitboard.flips(own, opp, sq)
+        key = self._key
+
+        # place down the piece and change the color of opponent that's in between
+        self.bitboards[player] = own | flipped | (1 << sq)
+        self.bitboards[1 - player] = opp ^ flipped
+        self._key = key ^ Bitboard.ZOBRIST[player][sq] ^ Bitboard.zobrist_flips(flipped)
+
+        count = Bitboard.popcount(flipped)
+        self.disks[player] += count + 1
+        self.disks[1 - player] -= count
+        self.empties -= 1
 
         # Switch turns
-        self.current_player = self.switch_turn()
+        self.current_player = 1 - player
+        return sq, flipped, player, key
+
+    def unmake_move(self, record):
+        """
+        Take back a move made by make_move or make_square, restoring the exact prior state.
+        Moves have to be taken back in the reverse order they were made.
+        :param record: The undo record returned when the move was made.
+        :return: Nothing
+        """
+        sq, flipped, player, key = record
+        if sq is not None:
+            self.bitboards[player] ^= flipped | (1 << sq)
+            self.bitboards[1 - player] |= flipped
+            count = Bitboard.popcount(flipped)
+            self.disks[player] -= count + 1
+            self.disks[1 - player] += count
+            self.empties += 1
+        self.current_player = player
+        self._key = key
 
     def clone(self):
         """
         Make a copy of current game state.
         """
-        return copy.deepcopy(self)
+        game = Othello()
+        game.bitboards = list(self.bitboards)
+        game._key = self._key
+        game.disks = list(self.disks)
+        game.empties = self.empties
+        game.current_player = self.current_player
+        game._moves_own = self._moves_own
+        game._moves_opp = self._moves_opp
+        game._moves = self._moves
+        return game
 
     def print_board(self):
         """
         Print the String representation of the board.
         :return: Nothing
         """
-        for row in range(len(self.board)):
+        board = self.board
+        for row in range(len(board)):
             print("|", end="")
-            for col in range(len(self.board[row])):
+            for col in range(len(board[row])):
                 char = " "
-                if type(self.board[row][col]) == int:
-                    char = self.board[row][col]
+                if type(board[row][col]) == int:
+                    char = board[row][col]
                 print(char, end="|")
             print("")
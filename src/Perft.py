@@ -0,0 +1,230 @@
+"""
+Perft.py counts the positions of the game tree to a fixed depth (perft), to check and time the move generator.
+
+A pass counts as a move. A position where the game is over before the depth is reached counts as one leaf.
+
+Perft is run with several backends that generate moves differently:
+"list" is a plain nested list move generator written only for this check, "bitboard" calls Bitboard.py directly,
+"othello" goes through Othello.make_square/unmake_move and "batch" expands whole layers with Batch.py (needs NumPy).
+Every backend has to find the REFERENCE counts, and the time each one takes gives its nodes per second.
+Every backend plays each move of the last ply, none counts the moves of the last ply without making them,
+so the nodes per second of all backends, and the --min-nps gate, measure the same work.
+
+Example:
+python Perft.py --depth 6 --min-nps 20000
+exits with status 1 if a count is wrong or the bitboard backend is slower than 20000 nodes per second.
+"""
+import argparse
+import sys
+import time
+import Bitboard
+import Othello
+
+# Test positions: the 64 squares row by row (B black, W white, . empty), then the player to move.
+POSITIONS = {
+    "initial": "...........................WB......BW........................... W",
+    "midgame": "..B........BB.......BB.....WBB....WWBB....WBW....BW.WWW......... W",
+    "pass": "BWWWWWWBBBBBBBWBBBBWWWWBBWBBWBWBBBBWWWW.BWBBW.WBBBBBBW..BBBBBB.. W",
+    "endgame": "B.BBBBBWWBWWWBWWWWWWWWBWB.BBWWBWBBBBBBBBB..BWBBB...WBBBB.BBB.B.B W",
+}
+
+# Perft counts of POSITIONS, index i is the count at depth i + 1.
+# The initial position counts are the published ones, the others agree across every backend.
+REFERENCE = {
+    "initial": [4, 12, 56, 244, 1396, 8200, 55092, 390216],
+    "midgame": [10, 112, 1214, 14772, 169998],
+    "pass": [1, 5, 13, 35, 61, 107, 117, 117],
+    "endgame": [8, 30, 190, 650, 3264, 8966, 32422, 63232],
+}
+
+BACKENDS = ("list", "bitboard", "othello", "batch")
+
+
+def parse(position):
+    """
+    :param position: A position string of POSITIONS.
+    :return: An Othello instance.
+    """
+    cells, player = position.split()
+    board = [[{"B": 0, "W": 1}.get(cells[row * 8 + col]) for col in range(8)] for row in range(8)]
+    return Othello.Othello(board, 1 if player == "W" else 0)
+
+
+def list_moves(board, player):
+    """
+    Find the moves of player on a nested list board, checking every direction of every empty square.
+    :return: A list of (row, col, flipped) tuples, flipped is a list of the (row, col) of the flipped pieces.
+    """
+    moves = []
+    for row in range(8):
+        for col in range(8):
+            if board[row][col] is not None:
+                continue
+            flipped = []
+            for d_row, d_col in Bitboard.DIRECTIONS:
+                line = []
+                tmp_row = row + d_row
+                tmp_col = col + d_col
+                while 0 <= tmp_row < 8 and 0 <= tmp_col < 8 and board[tmp_row][tmp_col] == 1 - player:
+                    line.append((tmp_row, tmp_col))
+                    tmp_row += d_row
+                    tmp_col += d_col
+                if line and 0 <= tmp_row < 8 and 0 <= tmp_col < 8 and board[tmp_row][tmp_col] == player:
+                    flipped.extend(line)
+            if flipped:
+                moves.append((row, col, flipped))
+    return moves
+
+
+def perft_list(board, player, depth):
+    """
+    Perft with the nested list move generator. board is changed and restored in place.
+    """
+    if depth == 0:
+        return 1
+    moves = list_moves(board, player)
+    if not moves:
+        if not list_moves(board, 1 - player):
+            return 1  # game over
+        return perft_list(board, 1 - player, depth - 1)
+    nodes = 0
+    for row, col, flipped in moves:
+        board[row][col] = player
+        for tmp_row, tmp_col in flipped:
+            board[tmp_row][tmp_col] = player
+        nodes += perft_list(board, 1 - player, depth - 1)
+        board[row][col] = None
+        for tmp_row, tmp_col in flipped:
+            board[tmp_row][tmp_col] = 1 - player
+    return nodes
+
+
+def perft_bitboard(own, opp, depth):
+    """
+    Perft on bitboards, own is the player to move.
+    """
+    if depth == 0:
+        return 1
+    moves = Bitboard.legal_moves(own, opp)
+    if not moves:
+        if not Bitboard.legal_moves(opp, own):
+            return 1  # game over
+        return perft_bitboard(opp, own, depth - 1)
+    nodes = 0
+    for sq in Bitboard.iter_squares(moves):
+        flipped = Bitboard.flips(own, opp, sq)
+        nodes += perft_bitboard(opp ^ flipped, own | flipped | (1 << sq), depth - 1)
+    return nodes
+
+
+def perft_othello(game, depth):
+    """
+    Perft through the make/unmake API of Othello. game is back to its original state when this returns.
+    """
+    if depth == 0:
+        return 1
+    moves = game.legal_moves()
+    if not moves:
+        if not Bitboard.legal_moves(game.bitboards[1 - game.current_player], game.bitboards[game.current_player]):
+            return 1  # game over
+        record = game.make_move(None)
+        nodes = perft_othello(game, depth - 1)
+        game.unmake_move(record)
+        return nodes
+    nodes = 0
+    for sq in Bitboard.iter_squares(moves):
+        record = game.make_square(sq)
+        nodes += perft_othello(game, depth - 1)
+        game.unmake_move(record)
+    return nodes
+
+
+def perft_batch(game, depth):
+    """
+    Perft by expanding the tree one whole layer at a time with Batch.expand.
+    """
+    import Batch
+    positions = Batch.pack([game])
+    leaves = 0
+    for _ in range(depth):
+        children, parents, moves, terminal = Batch.expand(positions)
+        leaves += int(terminal.sum())
+        positions = children
+    return leaves + len(positions)
+
+
+def perft(game, depth, backend="bitboard"):
+    """
+    :param game: A Othello instance, it is not changed.
+    :param depth: Number of plies.
+    :param backend: One of BACKENDS.
+    :return: The number of leaves of the game tree of game at depth.
+    """
+    if depth <= 0:
+        return 1
+    if backend == "list":
+        return perft_list(game.board, game.current_player, depth)
+    if backend == "bitboard":
+        return perft_bitboard(game.bitboards[game.current_player], game.bitboards[1 - game.current_player], depth)
+    if backend == "othello":
+        return perft_othello(game.clone(), depth)
+    if backend == "batch":
+        return perft_batch(game, depth)
+    raise ValueError(str.format("Unknown perft backend {0}", backend))
+
+
+def run(depth, backends=BACKENDS, positions=None):
+    """
+    Run perft for every test position and backend, up to depth or the deepest reference count.
+    :param positions: Names of POSITIONS to run, all of them by default.
+    :return: A list of dictionaries with the "position", "backend", "depth", "nodes", "expected" count,
+    "seconds" taken and "nodes_per_second".
+    """
+    results = []
+    for name in positions or sorted(POSITIONS):
+        game = parse(POSITIONS[name])
+        position_depth = min(depth, len(REFERENCE[name]))
+        for backend in backends:
+            start = time.perf_counter()
+            nodes = perft(game, position_depth, backend)
+            seconds = time.perf_counter() - start
+            results.append({"position": name, "backend": backend, "depth": position_depth, "nodes": nodes,
+                            "expected": REFERENCE[name][position_depth - 1], "seconds": seconds,
+                            "nodes_per_second": nodes / seconds if seconds else 0.0})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the Othello move generator.")
+    parser.add_argument("--depth", type=int, default=5, help="perft depth")
+    parser.add_argument("--backend", action="append", choices=BACKENDS,
+                        help="backend to run, can be repeated, all of them by default")
+    parser.add_argument("--min-nps", type=float, default=0,
+                        help="fail if the bitboard backend is slower than this many nodes per second in total")
+    args = parser.parse_args()
+
+    backends = args.backend or BACKENDS
+    if "batch" in backends:
+        try:
+            import numpy
+        except ImportError:
+            backends = [backend for backend in backends if backend != "batch"]
+            print("NumPy is not installed, skipping the batch backend")
+    results = run(args.depth, backends)
+    failed = False
+    for result in results:
+        status = "ok" if result["nodes"] == result["expected"] else "WRONG, expected " + str(result["expected"])
+        failed = failed or result["nodes"] != result["expected"]
+        print(str.format("{0:8} {1:9} depth {2}: {3:>9} nodes {4:>12.0f} nodes/s  {5}", result["position"],
+                         result["backend"], result["depth"], result["nodes"], result["nodes_per_second"], status))
+    bitboard = [result for result in results if result["backend"] == "bitboard"]
+    if bitboard and args.min_nps:
+        nodes_per_second = sum(result["nodes"] for result in bitboard) / sum(result["seconds"] for result in bitboard)
+        if nodes_per_second < args.min_nps:
+            print(str.format("bitboard backend too slow: {0:.0f} nodes/s", nodes_per_second))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+PositionIndex.py counts how often every position occurs in a collection of games and how those games ended.
+
+Positions are stored in their canonical form (see Bitboard.canonical), so the 8 symmetric copies of a position
+share one entry. build() replays game record files (see GameRecord.py) and writes the index file.
+PositionIndex reads it through mmap, like OpeningBook.
+
+build() never holds more than max_positions distinct positions in memory: when it has that many,
+it sorts them and writes them to a temporary run file, and the runs are merged into the index at the end.
+
+File format, all numbers little endian:
+header: MAGIC (8 bytes), number of records (uint64)
+records: black (uint64), white (uint64), player to move (uint8), visits (uint32), white wins (uint32),
+black wins (uint32), draws (uint32), sum of the final leads of white over black (int64), 41 bytes each.
+Records are sorted by (black, white, player to move) of the canonical position, so they are found by binary search.
+"""
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import Bitboard
+import GameRecord
+
+MAGIC = b"OTHPIDX1"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<QQBIIIIq")
+KEY = struct.Struct("<QQB")
+
+
+def game_positions(record):
+    """
+    :param record: A GameRecord.
+    :return: A generator of the canonical (black, white, player) of every position of the game, the initial one first.
+    """
+    yield Bitboard.canonical(Bitboard.INITIAL_BLACK, Bitboard.INITIAL_WHITE)[:2] + (1,)  # white moves first
+    for game, move in record.replay():
+        yield Bitboard.canonical(game.bitboards[0], game.bitboards[1])[:2] + (game.current_player,)
+
+
+def _write_run(directory, counts):
+    """
+    Write the counts sorted by position to a new file of directory.
+    :return: The path of the file.
+    """
+    handle, path = tempfile.mkstemp(dir=directory, suffix=".run")
+    with os.fdopen(handle, "wb") as run_file:
+        for key in sorted(counts):
+            run_file.write(RECORD.pack(*(key + tuple(counts[key]))))
+    return path
+
+
+def _read_run(path):
+    with open(path, "rb") as run_file:
+        while True:
+            data = run_file.read(RECORD.size)
+            if not data:
+                return
+            values = RECORD.unpack(data)
+            yield values[:3], values[3:]
+
+
+def build(path, record_paths, max_positions=1000000):
+    """
+    Index every position of every game of the game record files.
+    :param path: The index file to write.
+    :param record_paths: Paths of game record files.
+    :param max_positions: Most distinct positions held in memory at a time.
+    :return: The number of distinct canonical positions written.
+    :raise ValueError: If a file is not a game record file or one of its games holds an illegal move.
+    """
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+    runs = []
+    try:
+        counts = {}
+        for record_path in record_paths:
+            for record in GameRecord.read_records(record_path):
+                outcome = (1, int(record.result > 0), int(record.result < 0), int(record.result == 0), record.result)
+                for key in game_positions(record):
+                    stats = counts.get(key)
+                    if stats is None:
+                        counts[key] = list(outcome)
+                    else:
+                        for field in range(5):
+                            stats[field] += outcome[field]
+                if len(counts) >= max_positions:
+                    runs.append(_write_run(directory, counts))
+                    counts = {}
+        if counts or not runs:
+            runs.append(_write_run(directory, counts))
+
+        # merge the sorted runs, adding up the counts of a position found in several runs
+        size = 0
+        with open(path, "wb") as index_file:
+            index_file.write(HEADER.pack(MAGIC, 0))
+            current = None
+            for key, stats in heapq.merge(*[_read_run(run) for run in runs], key=lambda item: item[0]):
+                if current is not None and current[0] == key:
+                    current[1] = [total + value for total, value in zip(current[1], stats)]
+                    continue
+                if current is not None:
+                    index_file.write(RECORD.pack(*(current[0] + tuple(current[1]))))
+                    size += 1
+                current = [key, list(stats)]
+            if current is not None:
+                index_file.write(RECORD.pack(*(current[0] + tuple(current[1]))))
+                size += 1
+            index_file.seek(0)
+            index_file.write(HEADER.pack(MAGIC, size))
+        return size
+    finally:
+        for run in runs:
+            os.remove(run)
+        os.rmdir(directory)
+
+
+class PositionIndex:
+    """
+    A read only, memory mapped position index file.
+    Use it as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as index_file:
+            self.data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + self.size * RECORD.size:
+            self.data.close()
+            raise ValueError(str.format("{0} is not a position index file", path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self.data.close()
+
+    def __iter__(self):
+        """
+        :return: A generator of (black, white, player) canonical positions and their statistics, see lookup.
+        """
+        for index in range(self.size):
+            values = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            yield values[:3], self._stats(values)
+
+    def lookup(self, game):
+        """
+        :param game: A Othello instance or an Othello.Position, any of its symmetric copies finds the same entry.
+        :return: A dictionary with the "visits" of the position, the "white_wins", "black_wins" and "draws"
+        of the games it was in and their "mean_lead" of white over black. None if the position is not in the index.
+        """
+        if hasattr(game, "bitboards"):
+            black, white = game.bitboards
+        else:
+            black, white = game.black, game.white
+        key = Bitboard.canonical(black, white)[:2] + (game.current_player,)
+        low = 0
+        high = self.size
+        while low < high:
+            middle = (low + high) // 2
+            found = KEY.unpack_from(self.data, HEADER.size + middle * RECORD.size)
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return self._stats(RECORD.unpack_from(self.data, HEADER.size + middle * RECORD.size))
+        return None
+
+    @staticmethod
+    def _stats(values):
+        visits, white_wins, black_wins, draws, lead = values[3:]
+        return {"visits": visits, "white_wins": white_wins, "black_wins": black_wins, "draws": draws,
+                "mean_lead": lead / visits}
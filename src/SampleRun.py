@@ -1,14 +1,207 @@
 """
-SampleRun.py contains test scripts based on Othello game.
-It will create 2 AIs that play against each other using different strategy and algorithms.
-To show the efficiency of algorithm results
+SampleRun.py plays tournaments between the strategies of Algorithms.py.
+It makes 2 AIs play many games against each other using different strategies and algorithms,
+to show which one is stronger.
+
+Every pair of strategies plays the same number of games. Games are played in pairs:
+both games of a pair start from the same random opening, with the colors swapped,
+so neither strategy gets an advantage from its color or its openings.
+Games are spread across a pool of processes.
+
+For each pair of strategies it prints the win rate, the Elo difference with a 95% confidence interval,
+and the number of games played per second.
+
+Example:
+python SampleRun.py --games 1000 --workers 8 random most_eliminate minmax_move
 """
+import argparse
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import Algorithms
+import Bitboard
+import GameRecord
+import Othello
+
+# Searched by the mcts_move strategy, it keeps its tree from one move to the next within a process.
+MCTS_TREE = Algorithms.MonteCarlo()
+
+# Strategies by name. Each one takes an Othello instance and returns the game after its move.
+STRATEGIES = {
+    "random": Algorithms.random,
+    "most_eliminate": Algorithms.most_eliminate,
+    "minmax_move": lambda game: Algorithms.minmax_move(game, 1, game.current_player == 1),
+    "alphabeta_move": lambda game: Algorithms.alphabeta_move(game, 3),
+    "best_move": lambda game: Algorithms.best_move(game, 100),
+    "mcts_move": lambda game: Algorithms.mcts_move(game, 200, tree=MCTS_TREE),
+}
+
+
+def random_opening(rng, moves, played=None):
+    """
+    :param rng: A random.Random instance.
+    :param moves: Number of random moves to play from the initial board.
+    :param played: If given, a list the moves played are appended to, in the format of GameRecord.
+    :return: An Othello instance with the moves played.
+    """
+    game = Othello.Othello()
+    game.initialize_board()
+    for _ in range(moves):
+        squares = list(Bitboard.iter_squares(game.legal_moves()))
+        if not squares:
+            break
+        square = rng.choice(squares)
+        game.make_square(square)
+        if played is not None:
+            played.append(square)
+    return game
+
+
+def play_game(game, strategies, moves=None):
+    """
+    Play game to the end.
+    :param game: The Othello instance to start from, it is changed.
+    :param strategies: A tuple (black strategy, white strategy) of functions from STRATEGIES.
+    :param moves: If given, a list holding the moves from the initial board to game (empty if game is the
+    initial board, see random_opening for an opening), the moves played are appended to it.
+    It is in the format of GameRecord.
+    :return: The final lead in pieces of white over black.
+    :raise ValueError: If moves does not lead to game.
+    """
+    if moves is not None:
+        start = Othello.Othello()
+        start.initialize_board()
+        for start, _ in GameRecord.GameRecord(moves, 0).replay():
+            pass
+        if start.bitboards != game.bitboards or start.current_player != game.current_player:
+            raise ValueError("The moves given do not lead to the game, record the opening too")
+    while not game.is_terminal():
+        if not game.legal_moves():
+            game.make_move(None)  # pass
+            if moves is not None:
+                moves.append(GameRecord.PASS_MOVE)
+        next_game = strategies[game.current_player](game)
+        if moves is not None:
+            moves.append(GameRecord.played_move(game, next_game))
+        game = next_game
+    return game.count_disks(1) - game.count_disks(0)
+
+
+def play_pairs(first, second, seeds, opening_moves):
+    """
+    Play a pair of games per seed between two strategies, swapping colors. Runs in the worker processes.
+    :param first: Name of the first strategy.
+    :param second: Name of the second strategy.
+    :param seeds: One seed per pair of games, it picks the opening and the moves of random strategies.
+    :param opening_moves: Number of random moves of the opening.
+    :return: A tuple (wins, losses, draws) of the first strategy.
+    """
+    wins = losses = draws = 0
+    for seed in seeds:
+        rng = random.Random(seed)
+        opening = random_opening(rng, opening_moves)
+        for first_color in (0, 1):
+            random.seed(seed)
+            MCTS_TREE.rng.seed(seed)
+            if first_color == 0:
+                strategies = (STRATEGIES[first], STRATEGIES[second])
+            else:
+                strategies = (STRATEGIES[second], STRATEGIES[first])
+            white_lead = play_game(opening.clone(), strategies)
+            first_lead = white_lead if first_color == 1 else -white_lead
+            if first_lead > 0:
+                wins += 1
+            elif first_lead < 0:
+                losses += 1
+            else:
+                draws += 1
+    return wins, losses, draws
+
+
+def elo(wins, losses, draws):
+    """
+    Estimate the Elo difference between two players from their results against each other.
+    The confidence interval is the Wilson score interval of the score (a draw counts half a win),
+    so it stays wide when every game has the same result.
+    :return: A tuple (elo, low, high) where low and high bound the 95% confidence interval.
+    """
+    games = wins + losses + draws
+    if not games:
+        return 0.0, -math.inf, math.inf
+    score = (wins + 0.5 * draws) / games
+    z = 1.96
+    scale = 1 + z * z / games
+    center = (score + z * z / (2 * games)) / scale
+    margin = z / scale * math.sqrt(score * (1 - score) / games + z * z / (4 * games * games))
+
+    def to_elo(fraction):
+        if fraction <= 0:
+            return -math.inf
+        if fraction >= 1:
+            return math.inf
+        return -400 * math.log10(1 / fraction - 1)
+    return to_elo(score), to_elo(center - margin), to_elo(center + margin)
+
+
+def run_tournament(names, games=100, workers=None, opening_moves=4, seed=0, chunk=8):
+    """
+    Play every pair of strategies against each other.
+    :param names: Names of strategies from STRATEGIES.
+    :param games: Games per pair of strategies, rounded up to an even number.
+    :param workers: Number of processes, by default the number of processors.
+    :param opening_moves: Number of random moves of each opening.
+    :param seed: Seed of the openings, the same seed plays the same openings.
+    :param chunk: Pairs of games handed to a worker at a time.
+    :return: A list of dictionaries, one per pair of strategies, with the "first" and "second" strategy,
+    the "wins", "losses" and "draws" of the first one, its "win_rate", the "elo" difference with its
+    "elo_low" and "elo_high" bounds, and the "games_per_second".
+    """
+    for name in names:
+        if name not in STRATEGIES:
+            raise ValueError(str.format("Unknown strategy {0}", name))
+    pairs = (games + 1) // 2
+    results = []
+    with ProcessPoolExecutor(workers or os.cpu_count()) as executor:
+        for first, second in itertools.combinations(names, 2):
+            start = time.perf_counter()
+            seeds = [seed * 1000003 + index for index in range(pairs)]
+            futures = [executor.submit(play_pairs, first, second, seeds[index:index + chunk], opening_moves)
+                       for index in range(0, pairs, chunk)]
+            wins = losses = draws = 0
+            for future in futures:
+                result = future.result()
+                wins += result[0]
+                losses += result[1]
+                draws += result[2]
+            seconds = time.perf_counter() - start
+            rating, low, high = elo(wins, losses, draws)
+            played = wins + losses + draws
+            results.append({"first": first, "second": second, "wins": wins, "losses": losses, "draws": draws,
+                            "win_rate": (wins + 0.5 * draws) / played, "elo": rating, "elo_low": low,
+                            "elo_high": high, "games_per_second": played / seconds if seconds else 0.0})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a tournament between Othello strategies.")
+    parser.add_argument("strategies", nargs="*", default=["random", "most_eliminate", "minmax_move"],
+                        help="strategies to play, from: " + ", ".join(sorted(STRATEGIES)))
+    parser.add_argument("--games", type=int, default=100, help="games per pair of strategies")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes")
+    parser.add_argument("--opening-moves", type=int, default=4, help="random moves at the start of every game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the openings")
+    args = parser.parse_args()
 
-from Othello import *
-from Engine import *
+    results = run_tournament(args.strategies, args.games, args.workers, args.opening_moves, args.seed)
+    for result in results:
+        print(str.format("{0} vs {1}: +{2} -{3} ={4}  win rate {5:.1%}  Elo {6:+.0f} [{7:+.0f}, {8:+.0f}]  "
+                         "{9:.1f} games/s", result["first"], result["second"], result["wins"], result["losses"],
+                         result["draws"], result["win_rate"], result["elo"], result["elo_low"], result["elo_high"],
+                         result["games_per_second"]))
 
-init_game = Othello()
-init_game.initialize_board()
 
-player_1 =
-player_2 =
+if __name__ == '__main__':
+    main()
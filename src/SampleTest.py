@@ -3,8 +3,27 @@ sampleTest.py should be test cases where important functions/algorithms are to b
 """
 
 import unittest
+import unittest.mock
+import math
+import os
+import pickle
+import random
+import tempfile
 import Othello
 import Algorithms
+import Bitboard
+import Transposition
+import OpeningBook
+import SampleRun
+import GameRecord
+import PositionIndex
+import Perft
+import Engine
+try:
+    import numpy
+    import Batch
+except ImportError:
+    numpy = None
 
 
 class OthelloTest(unittest.TestCase):
@@ -27,6 +46,63 @@ class OthelloTest(unittest.TestCase):
     def testGameOver(self):
         self.failUnless(not self.game.is_game_over())
 
+    def testTerminal(self):
+        game = Othello.Othello([[0] * 8 for _ in range(7)] + [[1] * 7 + [None]], 1)
+        with unittest.mock.patch("builtins.print") as printed:
+            self.assertTrue(game.is_game_over())
+        printed.assert_not_called()
+        self.assertEqual(game.current_player, 1)  # not changed by the check
+        self.assertEqual(game.get_winner(), 0)  # black has more pieces
+        self.assertEqual(self.game.get_winner(), None)
+
+        game = Perft.parse(Perft.POSITIONS["pass"])
+        self.assertTrue(game.must_pass() and not game.is_terminal())
+        game.make_move(None)
+        self.assertTrue(not game.must_pass() and game.legal_moves())
+
+    def testIncrementalCounts(self):
+        games = random_games(3, 19)
+        for game in games:
+            empty = ~(game.bitboards[0] | game.bitboards[1]) & Bitboard.FULL
+            for color in (0, 1):
+                self.assertEqual(game.count_disks(color), Bitboard.popcount(game.bitboards[color]))
+                frontier = [sq for sq in Bitboard.iter_squares(game.bitboards[color])
+                            if Bitboard.neighbours(1 << sq) & empty]
+                self.assertEqual(game.count_frontier(color), len(frontier))
+            self.assertEqual(game.count_empty(), 64 - Bitboard.popcount(game.bitboards[0] | game.bitboards[1]))
+        game = games[len(games) // 2]
+        counts = (game.disks, game.empties, game.count_frontier(0), game.count_frontier(1))
+        records = [game.make_square(sq) for sq in [next(Bitboard.iter_squares(game.legal_moves()))]]
+        game.unmake_move(records.pop())
+        self.assertEqual((game.disks, game.empties, game.count_frontier(0), game.count_frontier(1)), counts)
+        self.assertEqual((self.game.count_frontier(0), self.game.count_frontier(1)), (2, 2))
+        self.assertEqual(self.game.count_corners(0) + self.game.count_x_squares(1), 0)
+
+    def testPosition(self):
+        position = Othello.Position.from_game(self.game)
+        self.assertEqual(position, Othello.Position(Bitboard.INITIAL_BLACK, Bitboard.INITIAL_WHITE, 1))
+        self.assertNotEqual(position, Othello.Position(Bitboard.INITIAL_BLACK, Bitboard.INITIAL_WHITE, 0))
+        self.assertEqual(position.key, self.game.key)
+        game = position.to_game()
+        self.assertEqual((game.bitboards, game.current_player, game.key), (self.game.bitboards, 1, self.game.key))
+        self.assertEqual(len({position, Othello.Position.from_game(self.game.clone())}), 1)
+        self.assertEqual(pickle.loads(pickle.dumps(position)), position)
+        self.assertFalse(hasattr(position, "__dict__"))
+        with self.assertRaises(AttributeError):
+            position.black = 0
+
+    def testLegalMovesCache(self):
+        moves = self.game.legal_moves()
+        self.game.current_player = 0  # changed directly, the cache has to notice
+        self.assertEqual(self.game.legal_moves(),
+                         Bitboard.legal_moves(self.game.bitboards[0], self.game.bitboards[1]))
+        self.game.current_player = 1
+        self.assertEqual(self.game.legal_moves(), moves)
+        record = self.game.make_square(next(Bitboard.iter_squares(moves)))
+        self.assertNotEqual(self.game.legal_moves(), moves)
+        self.game.unmake_move(record)
+        self.assertEqual(self.game.clone().legal_moves(), moves)
+
     def testValidPosition(self):
         self.failUnless(self.game.valid_position((2, 4))
                         and self.game.valid_position((3, 5))
@@ -47,11 +123,732 @@ class OthelloTest(unittest.TestCase):
         self.assertEqual(self.game.count_disks(0), 1)  # Black should have 1
         self.failUnless(self.game.current_player == 0)  # Should be Black's turn next
 
-# class AlgorithmsTest(unittest.TestCase):
-#
-#     # def setUp(self):
-#     # def tearDown(self):
-#     # def tearDown(self):
+
+class BitboardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Othello.Othello()
+        self.game.initialize_board()
+
+    def tearDown(self):
+        self.game = None
+
+    def testHasLegalMove(self):
+        for game in random_games(5, 18):
+            own = game.bitboards[game.current_player]
+            opp = game.bitboards[1 - game.current_player]
+            self.assertEqual(Bitboard.has_legal_move(own, opp), Bitboard.legal_moves(own, opp) != 0)
+            self.assertEqual(Bitboard.has_legal_move(opp, own), Bitboard.legal_moves(opp, own) != 0)
+
+    def testStable(self):
+        self.assertEqual(Bitboard.stable(Bitboard.FULL, 0), Bitboard.FULL)
+        self.assertEqual(Bitboard.stable(Bitboard.INITIAL_BLACK, Bitboard.INITIAL_WHITE), 0)
+        rng = random.Random(21)
+        for game in random_games(4, 21)[::5]:
+            black, white = game.bitboards
+            stable = [Bitboard.stable(black, white), Bitboard.stable(white, black)]
+            self.assertEqual(stable[0] & Bitboard.edge_stable(black, white), Bitboard.edge_stable(black, white))
+            self.assertEqual(stable[1] & Bitboard.edge_stable(white, black), Bitboard.edge_stable(white, black))
+            for _ in range(3):  # stable disks keep their color in any continuation
+                playout = game.clone()
+                while not playout.is_terminal():
+                    if playout.must_pass():
+                        playout.make_move(None)
+                    playout.make_square(rng.choice(list(Bitboard.iter_squares(playout.legal_moves()))))
+                    self.assertEqual(playout.bitboards[0] & stable[0], stable[0])
+                    self.assertEqual(playout.bitboards[1] & stable[1], stable[1])
+            lower, upper = game.score_bounds()
+            final = playout.count_disks(game.current_player) - playout.count_disks(1 - game.current_player)
+            self.assertTrue(lower <= final <= upper)
+
+    def testPotentialMobility(self):
+        self.assertEqual(Bitboard.popcount(Bitboard.potential_mobility(Bitboard.INITIAL_WHITE, Bitboard.INITIAL_BLACK)),
+                         10)
+        self.assertEqual(self.game.count_potential_mobility(0), 10)
+
+    def testBoardRoundTrip(self):
+        board = self.game.board
+        self.assertEqual(board[3][3], 1)
+        self.assertEqual(board[3][4], 0)
+        self.assertEqual(board[0][0], None)
+        self.assertEqual(Othello.Othello(board).bitboards, self.game.bitboards)
+
+    def testLegalMoves(self):
+        moves = [Bitboard.position(sq) for sq in Bitboard.iter_squares(self.game.legal_moves())]
+        self.assertEqual(moves, [(2, 4), (3, 5), (4, 2), (5, 3)])
+
+    def testPlacePieceFlips(self):
+        self.game.place_piece((2, 4))
+        self.assertEqual(self.game.count_disks(1), 4)
+        self.assertEqual(self.game.count_disks(0), 1)
+        self.assertEqual(self.game.current_player, 0)
+        self.assertRaises(ValueError, self.game.place_piece, (0, 0))
+
+    def testNoWrapAround(self):
+        # white at the end of row 0, black at the start of row 1: not a line on the board
+        board = [[None] * 8 for _ in range(8)]
+        board[0][6] = 1
+        board[0][7] = 0
+        board[1][1] = 1
+        game = Othello.Othello(board)
+        self.assertTrue(not game.valid_position((1, 0)))
+
+    def testDiagonalCapture(self):
+        board = [[None] * 8 for _ in range(8)]
+        board[2][2] = 1
+        board[3][3] = 0
+        board[4][4] = 0
+        board[7][0] = 1
+        board[6][1] = 0
+        game = Othello.Othello(board)
+        self.assertTrue(game.valid_position((5, 5)) and game.valid_position((5, 2)))
+        game.place_piece((5, 5))  # flips (4, 4) and (3, 3) towards (2, 2)
+        self.assertEqual((game.count_disks(1), game.count_disks(0)), (5, 1))
+        game.current_player = 1
+        game.place_piece((5, 2))  # flips (6, 1) towards (7, 0)
+        self.assertEqual((game.count_disks(1), game.count_disks(0)), (7, 0))
+
+    def testMakeUnmakeMove(self):
+        history = []
+        records = []
+        for _ in range(20):
+            history.append((list(self.game.bitboards), self.game.current_player))
+            moves = list(Bitboard.iter_squares(self.game.legal_moves()))
+            position = Bitboard.position(moves[-1]) if moves else None
+            records.append(self.game.make_move(position))
+        while records:
+            self.game.unmake_move(records.pop())
+            self.assertEqual((self.game.bitboards, self.game.current_player), history.pop())
+
+    def testZobristKey(self):
+        start_key = self.game.key
+        records = []
+        for _ in range(30):
+            moves = list(Bitboard.iter_squares(self.game.legal_moves()))
+            records.append(self.game.make_move(Bitboard.position(moves[0]) if moves else None))
+            fresh = Othello.Othello.from_bitboards(self.game.bitboards[0], self.game.bitboards[1],
+                                                   self.game.current_player)
+            self.assertEqual(self.game.key, fresh.key)
+        self.assertNotEqual(self.game.key, Othello.Othello(self.game.board, 1 - self.game.current_player).key)
+        while records:
+            self.game.unmake_move(records.pop())
+        self.assertEqual(self.game.key, start_key)
+
+    def testIterMoves(self):
+        self.game.place_piece((2, 4))
+        moves = list(self.game.iter_moves())
+        self.assertEqual(len(moves), len(self.game.successors()))
+        for position, flipped, flip_count in moves:
+            child = self.game.clone()
+            child.place_piece(position)
+            self.assertEqual(child.count_disks(1) + flip_count, self.game.count_disks(1))
+            self.assertEqual(child.bitboards[1], self.game.bitboards[1] & ~flipped)
+
+
+class AlgorithmsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Othello.Othello()
+        self.game.initialize_board()
+
+    def tearDown(self):
+        self.game = None
+
+    def testMinmaxMove(self):
+        board = self.game.board
+        move = Algorithms.minmax_move(self.game, 2, True)
+        self.assertEqual(self.game.board, board)  # searching leaves the game untouched
+        self.assertTrue(move.bitboards in [successor.bitboards for successor in self.game.successors()])
+        self.assertEqual(move.current_player, 0)
+        # white has no move next to the black corner, it has to pass
+        game = Othello.Othello([[0, 1] + [None] * 6] + [[None] * 8 for _ in range(7)], 1)
+        move = Algorithms.minmax_move(game, 2, True)
+        self.assertEqual(move.bitboards, game.bitboards)
+        self.assertEqual(move.current_player, 0)
+
+    def testMostEliminate(self):
+        self.game.place_piece((2, 4))
+        self.game.place_piece((2, 5))
+        most_flips = max(flip_count for _, _, flip_count in self.game.iter_moves())
+        move = Algorithms.most_eliminate(self.game)
+        self.assertEqual(self.game.count_disks(0) - move.count_disks(0), most_flips)
+
+    def testAlphaBetaMatchesMinmax(self):
+        for position in [(2, 4), (2, 5), (2, 6)]:
+            self.game.place_piece(position)
+            white_lead = Algorithms.minmax(self.game, 4, self.game.current_player == 1)
+            square, score = Algorithms.AlphaBeta().search(self.game, 4)
+            self.assertEqual(score, white_lead if self.game.current_player == 1 else -white_lead)
+
+    def testFeatureEvaluation(self):
+        self.assertEqual(Algorithms.feature_evaluation(self.game), 0)  # symmetric start
+        game = Othello.Othello([[1, 0, None] + [None] * 5] + [[None] * 8 for _ in range(7)], 1)
+        # white holds a stable corner, both have one frontier piece,
+        # 4 empty squares are next to the black piece and 2 next to the white one
+        weights = Algorithms.FEATURE_WEIGHTS
+        self.assertEqual(Algorithms.feature_evaluation(game), weights[1] + weights[4] + 2 * weights[5])
+        square, score = Algorithms.AlphaBeta(evaluate=Algorithms.feature_evaluation).search(self.game, 3)
+        self.assertTrue(self.game.legal_moves() >> square & 1)
+        game, winning_square = winning_move_position()
+        square, score = Algorithms.AlphaBeta(evaluate=Algorithms.feature_evaluation).search(game, 2)
+        self.assertEqual(square, winning_square)
+        self.assertTrue(score > Algorithms.WIN_SCORE)
+
+    def testPatternEvaluator(self):
+        self.assertEqual(len(Algorithms.PATTERN_INSTANCES), 34)
+        evaluate = Algorithms.PatternEvaluator()
+        weights = Algorithms.default_pattern_weights()
+        for game in random_games(3, 20):
+            black, white = game.bitboards
+            score = evaluate(game)  # updated from the previous position
+            indices = Algorithms.pattern_indices(black, white)
+            self.assertEqual(evaluate.indices, indices)
+            full = sum(weights[name][index] for (name, _), index in zip(Algorithms.PATTERN_INSTANCES, indices))
+            self.assertEqual(score, full if game.current_player == 0 else -full)
+            swapped = Othello.Othello.from_bitboards(white, black, 1 - game.current_player)
+            self.assertEqual(Algorithms.PatternEvaluator(weights)(swapped), score)
+        square, score = Algorithms.AlphaBeta(evaluate=evaluate).search(self.game, 3)
+        self.assertTrue(self.game.legal_moves() >> square & 1)
+        highest = sum(max(max(weights[name]), -min(weights[name])) for name, _ in Algorithms.PATTERN_INSTANCES)
+        self.assertTrue(highest < Algorithms.WIN_SCORE)
+        game, winning_square = winning_move_position()
+        self.assertTrue(abs(evaluate(game)) > 64)  # more than any lead in pieces
+        square, score = Algorithms.AlphaBeta(evaluate=evaluate).search(game, 2)
+        self.assertEqual(square, winning_square)
+        self.assertTrue(score > Algorithms.WIN_SCORE)
+
+    def testMonteCarlo(self):
+        tree = Algorithms.MonteCarlo(seed=25)
+        square = tree.search(self.game, iterations=300)
+        self.assertTrue(self.game.legal_moves() >> square & 1)
+        self.assertEqual(tree.visits[0], 300)
+        self.assertEqual(len({len(tree.parents), len(tree.moves), len(tree.first_child), len(tree.child_counts),
+                              len(tree.visits), len(tree.wins)}), 1)
+        children = range(tree.first_child[0], tree.first_child[0] + tree.child_counts[0])
+        self.assertEqual(sum(tree.visits[child] for child in children), 300)  # the root is expanded right away
+        # the tree is kept for a position 2 moves later
+        game = self.game.clone()
+        game.make_square(square)
+        game.make_square(next(Bitboard.iter_squares(game.legal_moves())))
+        tree.search(game, iterations=10)
+        self.assertTrue(tree.visits[0] > 10)
+        self.assertEqual(tree.parents[0], -1)
+        tree.search(position_with_empties(20, 25), iterations=10)
+        self.assertEqual(tree.visits[0], 10)  # unrelated position, the tree starts over
+
+    def testMonteCarloNoBudget(self):
+        for iterations, time_limit_ms in ((0, None), (None, 0), (0, 0)):
+            next_game = Algorithms.mcts_move(self.game, iterations, time_limit_ms)
+            self.assertIn(next_game.bitboards, [successor.bitboards for successor in self.game.successors()])
+        next_game, stats = Engine.SearchEngine("mcts", time_limit_ms=0).run(self.game)
+        self.assertEqual(stats.playouts, 1)
+        self.assertTrue(self.game.legal_moves() >> Bitboard.square(*stats.move) & 1)
+
+    def testMonteCarloEndgame(self):
+        solver = Algorithms.EndgameSolver()
+        for seed in range(3):
+            game = position_with_empties(3, seed)
+            lead = Algorithms.MonteCarlo(seed=seed).playout(game.bitboards[game.current_player],
+                                                            game.bitboards[1 - game.current_player])
+            self.assertTrue(-64 <= lead <= 64)
+            best = solver.solve(game)[1]
+            next_game = Algorithms.mcts_move(game, 300, tree=Algorithms.MonteCarlo(seed=seed))
+            self.assertEqual(next_game.current_player, 1 - game.current_player)
+            margin = -solver.solve(next_game)[1]
+            self.assertEqual((margin > 0) - (margin < 0), (best > 0) - (best < 0))
+
+    def testAlphaBetaMove(self):
+        move = Algorithms.alphabeta_move(self.game, 3)
+        self.assertTrue(move.bitboards in [successor.bitboards for successor in self.game.successors()])
+
+    def testIterativeDeepening(self):
+        board = self.game.board
+        search = Algorithms.AlphaBeta()
+        square, score, depth = search.iterative_deepening(self.game, 60000, max_depth=4)
+        self.assertEqual(depth, 4)
+        self.assertEqual(score, Algorithms.AlphaBeta().search(self.game, 4)[1])
+        self.assertEqual(self.game.board, board)
+        square, score, depth = search.iterative_deepening(self.game, 0)
+        self.assertTrue(depth >= 1 and self.game.valid_position(Bitboard.position(square)))
+
+    def testBestMove(self):
+        move = Algorithms.best_move(self.game, 20)
+        self.assertTrue(move.bitboards in [successor.bitboards for successor in self.game.successors()])
+
+    def testParallelSearch(self):
+        self.game.place_piece((2, 4))
+        square, score, stats = Algorithms.parallel_search(self.game, 4, workers=2)
+        self.assertEqual(score, Algorithms.AlphaBeta().search(self.game, 4)[1])
+        self.assertTrue(self.game.valid_position(Bitboard.position(square)))
+        self.assertEqual(stats["workers"], 2)
+        move = Algorithms.minmax_move(self.game, 2, False, workers=2)
+        self.assertTrue(move.bitboards in [successor.bitboards for successor in self.game.successors()])
+
+    def testEndgameSolver(self):
+        game = position_with_empties(9, 12)
+        square, margin = Algorithms.EndgameSolver().solve(game)
+        # alpha-beta adds WIN_SCORE to the lead of a won game
+        win = (margin > 0) - (margin < 0)
+        self.assertEqual(Algorithms.AlphaBeta().search(game, 12)[1], margin + win * Algorithms.WIN_SCORE)
+        next_game = Algorithms.endgame_move(game)
+        self.assertEqual(-Algorithms.EndgameSolver().solve(next_game)[1], margin)
+        square, result = Algorithms.EndgameSolver().outcome(game)
+        self.assertEqual(result, (margin > 0) - (margin < 0))
+
+    def testCompareOrderings(self):
+        report = Algorithms.compare_orderings(self.game, 4, 1)
+        self.assertEqual(report["none"][1], 0)
+        self.assertEqual(set(report), {"none", "all", "best", "corners", "history"})
+        self.assertEqual(report["all"][0] + report["all"][1], report["none"][0])
+
+
+class TranspositionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = Transposition.TranspositionTable(1)
+
+    def tearDown(self):
+        self.table = None
+
+    def testMemoryBudget(self):
+        self.assertEqual(self.table.size * Transposition.ENTRY_SIZE, 1024 * 1024)
+        self.assertEqual(Transposition.TranspositionTable(3).size, self.table.size * 2)
+
+    def testStoreProbe(self):
+        self.assertEqual(self.table.probe(12345), None)
+        self.table.store(12345, 3, -7, Transposition.LOWER, 19)
+        self.assertEqual(self.table.probe(12345), (3, -7, Transposition.LOWER, 19))
+        self.assertEqual(self.table.stats(), {"hits": 1, "misses": 1, "overwrites": 0})
+
+    def testDepthPreferredReplacement(self):
+        other = 12345 + self.table.size  # same slot, different position
+        self.table.store(12345, 5, 1, Transposition.EXACT)
+        self.table.store(other, 2, 2, Transposition.EXACT)
+        self.assertEqual(self.table.probe(other), None)  # shallower entry of the same search is dropped
+        self.table.new_search()
+        self.table.store(other, 2, 2, Transposition.EXACT)
+        self.assertEqual(self.table.probe(other)[1], 2)  # older entries are replaced
+        self.assertEqual(self.table.overwrites, 1)
+
+    def testSharedTable(self):
+        shared = Transposition.SharedTranspositionTable(1)
+        attached = Transposition.SharedTranspositionTable(1, shared.name)
+        try:
+            self.assertEqual(shared.size, self.table.size)
+            shared.store(12345, 3, -7, Transposition.LOWER, 19)
+            self.assertEqual(attached.probe(12345), (3, -7, Transposition.LOWER, 19))
+            attached.store(54321, 4, 2, Transposition.EXACT, Transposition.PASS_MOVE)
+            self.assertEqual(shared.probe(54321), (4, 2, Transposition.EXACT, Transposition.PASS_MOVE))
+            self.assertEqual(shared.probe(54321 + shared.size), None)
+        finally:
+            attached.close()
+            shared.close()
+            shared.unlink()
+
+    def testLazySmpSearch(self):
+        game = Othello.Othello()
+        game.initialize_board()
+        game.place_piece((2, 4))
+        square, score, stats = Algorithms.lazy_smp_search(game, 60000, workers=2, max_depth=4, table_mb=1)
+        self.assertEqual(score, Algorithms.AlphaBeta().search(game, 4)[1])
+        self.assertEqual((stats["depth"], stats["workers"]), (4, 2))
+
+    def testMinmaxWithTable(self):
+        game = Othello.Othello()
+        game.initialize_board()
+        game.place_piece((2, 4))
+        value = Algorithms.minmax(game, 3, False)
+        self.assertEqual(Algorithms.minmax(game, 3, False, self.table), value)
+        self.assertEqual(Algorithms.minmax(game, 3, False, self.table), value)
+        self.assertTrue(self.table.hits > 0)
+
+
+class OpeningBookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "opening.book")
+        self.records = OpeningBook.build(self.path, plies=2, depth=3, moves_per_position=2, table_mb=1)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testOpeningPositions(self):
+        self.assertEqual(len(OpeningBook.opening_positions(2)), 1 + 4 + 12)
+
+    def testLookup(self):
+        with OpeningBook.OpeningBook(self.path) as book:
+            self.assertEqual(len(book), self.records)
+            for game in OpeningBook.opening_positions(2):
+                moves = book.lookup(game.key)
+                self.assertTrue(1 <= len(moves) <= 2)
+                self.assertEqual(moves[0][1], Algorithms.AlphaBeta().search(game, 3)[1])
+                self.assertTrue(game.valid_position(Bitboard.position(book.best_move(game))))
+            self.assertEqual(book.lookup(12345), [])
+
+    def testWinningMove(self):
+        game, winning_square = winning_move_position()
+        path = os.path.join(self.directory.name, "winning.book")
+        OpeningBook.build(path, plies=0, depth=1, moves_per_position=1, table_mb=1, start=game)
+        with OpeningBook.OpeningBook(path) as book:
+            square, score, depth = book.lookup(game.key)[0]
+            self.assertEqual(square, winning_square)
+            self.assertTrue(score > Algorithms.WIN_SCORE)
+
+    def testBestMoveUsesBook(self):
+        game = Othello.Othello()
+        game.initialize_board()
+        with OpeningBook.OpeningBook(self.path) as book:
+            move = Algorithms.best_move(game, 0, book=book)
+            expected = game.clone()
+            expected.make_square(book.best_move(game))
+            self.assertEqual(move.bitboards, expected.bitboards)
+
+
+class SampleRunTest(unittest.TestCase):
+
+    def testElo(self):
+        self.assertEqual(SampleRun.elo(5, 5, 0)[0], 0)
+        rating, low, high = SampleRun.elo(75, 25, 0)
+        self.assertAlmostEqual(rating, 190.85, 2)
+        self.assertTrue(low < rating < high)
+        self.assertEqual(SampleRun.elo(10, 0, 0)[0], float("inf"))
+        # the interval stays open on one side only when every game has the same result
+        rating, low, high = SampleRun.elo(4, 0, 0)
+        self.assertTrue(0 < low < math.inf)
+        self.assertEqual(high, math.inf)
+        rating, low, high = SampleRun.elo(0, 4, 0)
+        self.assertEqual(low, -math.inf)
+        self.assertTrue(-math.inf < high < 0)
+        rating, low, high = SampleRun.elo(3, 1, 0)
+        self.assertTrue(-math.inf < low < rating < high < math.inf)
+
+    def testPlayPairs(self):
+        wins, losses, draws = SampleRun.play_pairs("most_eliminate", "most_eliminate", [1, 2, 3], 4)
+        self.assertEqual(wins + losses + draws, 6)
+        self.assertEqual(wins, losses)  # the same strategy wins each opening once with each color
+
+    def testRunTournament(self):
+        results = SampleRun.run_tournament(["random", "most_eliminate"], games=4, workers=2)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["wins"] + results[0]["losses"] + results[0]["draws"], 4)
+
+
+class GameRecordTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "games.bin")
+        self.records = []
+        for seed in range(3):
+            random.seed(seed)
+            game = Othello.Othello()
+            game.initialize_board()
+            moves = []
+            result = SampleRun.play_game(game, (Algorithms.random, Algorithms.most_eliminate), moves)
+            self.records.append(GameRecord.GameRecord(moves, result, "random", "most_eliminate", seed, 10 * seed))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testRoundTrip(self):
+        with GameRecord.GameRecordWriter(self.path) as writer:
+            for record in self.records[:2]:
+                writer.write(record)
+        with GameRecord.GameRecordWriter(self.path, append=True) as writer:
+            writer.write(self.records[2])
+        read = list(GameRecord.read_records(self.path))
+        self.assertEqual(read, self.records)
+        size = len(GameRecord.MAGIC) + sum(4 + GameRecord.RECORD.size + 20 + len(record.moves) for record in read)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def testReplay(self):
+        for record in self.records:
+            for game, move in record.replay():
+                pass
+            self.assertTrue(game.is_terminal())
+            self.assertEqual(game.count_disks(1) - game.count_disks(0), record.result)
+
+    def testIllegalReplay(self):
+        for moves in ([0], [GameRecord.PASS_MOVE], self.records[0].moves + bytes([GameRecord.PASS_MOVE])):
+            with self.assertRaises(ValueError):
+                list(GameRecord.GameRecord(moves, 0).replay())
+
+    def testRecordedOpening(self):
+        moves = []
+        game = SampleRun.random_opening(random.Random(4), 4, moves)
+        self.assertEqual(len(moves), 4)
+        random.seed(4)
+        result = SampleRun.play_game(game.clone(), (Algorithms.random, Algorithms.random), moves)
+        for final, move in GameRecord.GameRecord(moves, result).replay():
+            pass
+        self.assertTrue(final.is_terminal())
+        self.assertEqual(final.count_disks(1) - final.count_disks(0), result)
+        with self.assertRaises(ValueError):
+            SampleRun.play_game(game, (Algorithms.random, Algorithms.random), [])  # the opening is missing
+
+    def testTruncated(self):
+        with GameRecord.GameRecordWriter(self.path) as writer:
+            writer.write(self.records[0])
+        with open(self.path, "r+b") as record_file:
+            record_file.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            list(GameRecord.read_records(self.path))
+        with self.assertRaises(ValueError):
+            GameRecord.GameRecord([65], 0)
+
+
+class PositionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.records_path = os.path.join(self.directory.name, "games.bin")
+        self.path = os.path.join(self.directory.name, "positions.index")
+        self.records = []
+        with GameRecord.GameRecordWriter(self.records_path) as writer:
+            for seed in range(4):
+                random.seed(seed)
+                game = SampleRun.random_opening(random.Random(seed), 0)
+                moves = []
+                result = SampleRun.play_game(game, (Algorithms.random, Algorithms.random), moves)
+                self.records.append(GameRecord.GameRecord(moves, result))
+                writer.write(self.records[-1])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testSymmetries(self):
+        for sq in range(64):
+            row, col = Bitboard.position(sq)
+            images = [Bitboard.square(*image) for image in
+                      [(row, col), (row, 7 - col), (7 - row, col), (7 - row, 7 - col),
+                       (col, row), (7 - col, row), (col, 7 - row), (7 - col, 7 - row)]]
+            self.assertEqual(Bitboard.symmetries(1 << sq), [1 << image for image in images])
+        game = random_games(1, 24)[10]
+        canonical = Othello.Position.from_game(game).canonical()
+        for black, white in zip(Bitboard.symmetries(game.bitboards[0]), Bitboard.symmetries(game.bitboards[1])):
+            self.assertEqual(Othello.Position(black, white, game.current_player).canonical(), canonical)
+
+    def testBuildAndLookup(self):
+        # a run of at most 50 positions forces several runs to be merged
+        size = PositionIndex.build(self.path, [self.records_path, self.records_path], max_positions=50)
+        expected = {}
+        for record in self.records:
+            for key in PositionIndex.game_positions(record):
+                stats = expected.setdefault(key, [0, 0, 0, 0, 0])
+                stats[0] += 2
+                stats[1] += 2 * (record.result > 0)
+                stats[2] += 2 * (record.result < 0)
+                stats[3] += 2 * (record.result == 0)
+                stats[4] += 2 * record.result
+        self.assertEqual(size, len(expected))
+        with PositionIndex.PositionIndex(self.path) as index:
+            self.assertEqual(len(index), size)
+            keys = [key for key, _ in index]
+            self.assertEqual(keys, sorted(expected))
+            initial = Othello.Othello()
+            initial.initialize_board()
+            self.assertEqual(index.lookup(initial)["visits"], 8)
+            for key, (visits, white_wins, black_wins, draws, lead) in expected.items():
+                mirrored = Othello.Position(Bitboard.flip_diagonal(key[0]), Bitboard.flip_diagonal(key[1]), key[2])
+                self.assertEqual(index.lookup(mirrored), {"visits": visits, "white_wins": white_wins,
+                                                          "black_wins": black_wins, "draws": draws,
+                                                          "mean_lead": lead / visits})
+            self.assertEqual(index.lookup(Othello.Position(1, 2, 0)), None)
+
+
+class PerftTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backends = [backend for backend in Perft.BACKENDS if backend != "batch" or numpy is not None]
+
+    def testInitialPosition(self):
+        game = Othello.Othello()
+        game.initialize_board()
+        self.assertEqual(Perft.parse(Perft.POSITIONS["initial"]).bitboards, game.bitboards)
+        for backend in self.backends:
+            self.assertEqual(Perft.perft(game, 4, backend), 244)
+
+    def testReferenceCounts(self):
+        for result in Perft.run(3, self.backends):
+            self.assertEqual(result["nodes"], result["expected"], result)
+
+
+class EngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Othello.Othello()
+        self.game.initialize_board()
+
+    def testAlphaBetaStats(self):
+        engine = Engine.SearchEngine("alphabeta", depth=4)
+        next_game, stats = engine.run(self.game)
+        self.assertEqual(next_game.count_disks(0) + next_game.count_disks(1), 5)
+        self.assertEqual(self.game.count_disks(0) + self.game.count_disks(1), 4)  # not changed
+        self.assertEqual(stats.depth, 4)
+        self.assertEqual(sorted(stats.nodes_by_depth), [0, 1, 2, 3, 4])
+        self.assertEqual(stats.nodes_by_depth[0], 1)
+        self.assertEqual(stats.nodes_by_depth[1], 4)
+        self.assertEqual(stats.nodes, sum(stats.nodes_by_depth.values()))
+        self.assertAlmostEqual(stats.effective_branching_factor, stats.nodes ** 0.25)
+        self.assertTrue(stats.cutoffs > 0)
+        self.assertTrue(stats.table_misses > 0)
+        self.assertTrue(stats.finished)
+        self.assertTrue(stats.wall_seconds > 0)
+        # the counts match those of the plain search
+        search = Algorithms.AlphaBeta()
+        search.search(self.game, 4)
+        self.assertEqual(stats.nodes, search.nodes)
+        self.assertEqual(stats.cutoffs, search.cutoffs)
+
+    def testMinmaxStats(self):
+        minmax = Algorithms.minmax
+        engine = Engine.SearchEngine("minmax", depth=2)
+        next_game, stats = engine.run(self.game)
+        self.assertEqual([stats.nodes_by_depth[ply] for ply in range(4)],
+                         [1, 4, 12, 56])
+        self.assertEqual(stats.depth, 3)
+        self.assertIsNotNone(stats.move)
+        self.assertIs(Algorithms.minmax, minmax)  # the module is not patched
+
+    def testCallback(self):
+        updates = []
+        engine = Engine.SearchEngine("iterative", time_limit_ms=50, callback=updates.append)
+        next_game, stats = engine.run(self.game)
+        self.assertTrue(len(updates) >= 2)  # at least one iteration and the end
+        self.assertIs(updates[-1], stats)
+        self.assertTrue(stats.depth >= 1)
+
+    def testPass(self):
+        # white has no move next to the black corner, it has to pass
+        game = Othello.Othello([[0, 1] + [None] * 6] + [[None] * 8 for _ in range(7)], 1)
+        for strategy in Engine.STRATEGIES:
+            next_game, stats = Engine.SearchEngine(strategy, iterations=10).run(game)
+            self.assertEqual(next_game.bitboards, game.bitboards)
+            self.assertEqual(next_game.current_player, 0)
+            self.assertIsNone(stats.move)
+
+    def testOtherStrategies(self):
+        for strategy in ("random", "most_eliminate"):
+            next_game, stats = Engine.SearchEngine(strategy).run(self.game)
+            self.assertEqual(stats.nodes, 5)
+            self.assertIsNotNone(stats.move)
+        game = position_with_empties(8, 1)
+        next_game, stats = Engine.SearchEngine("endgame", track_memory=True).run(game)
+        self.assertEqual(stats.score, Algorithms.EndgameSolver().solve(game)[1])
+        self.assertTrue(stats.traced_peak_bytes > 0)
+        engine = Engine.SearchEngine("mcts", iterations=200, time_limit_ms=60000)
+        next_game, stats = engine.run(self.game)
+        self.assertEqual(stats.playouts, 200)
+        self.assertEqual(stats.nodes, len(engine.tree.visits))
+        self.assertEqual(stats.nodes_by_depth[1], 4)
+        self.assertTrue(stats.wall_seconds > 0)
+        self.assertTrue(self.game.legal_moves() >> Bitboard.square(*stats.move) & 1)
+        with self.assertRaises(ValueError):
+            Engine.SearchEngine("unknown").run(self.game)
+
+
+def random_games(count, seed):
+    """
+    Play random games from the initial board and collect every position reached.
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = Othello.Othello()
+        game.initialize_board()
+        while True:
+            moves = list(Bitboard.iter_squares(game.legal_moves()))
+            if not moves:
+                game.make_move(None)
+                if not game.legal_moves():
+                    break
+                continue
+            game.make_square(rng.choice(moves))
+            games.append(game.clone())
+    return games
+
+
+def winning_move_position():
+    """
+    A position where white, to move, ends the game with a win by playing (6, 3),
+    while the corner (7, 0) looks better to the evaluation functions.
+    :return: A tuple (game, square), square is the bit index of the winning move.
+    """
+    return Othello.Othello.from_bitboards(0x0006000042000000, 0x0001040000004048, 1), Bitboard.square(6, 3)
+
+
+def position_with_empties(empties, seed):
+    """
+    Play random moves from the initial board until only empties squares are left.
+    """
+    rng = random.Random(seed)
+    game = Othello.Othello()
+    game.initialize_board()
+    while 64 - Bitboard.popcount(game.bitboards[0] | game.bitboards[1]) > empties:
+        moves = list(Bitboard.iter_squares(game.legal_moves()))
+        if moves:
+            game.make_square(rng.choice(moves))
+        elif Bitboard.legal_moves(game.bitboards[1 - game.current_player], game.bitboards[game.current_player]):
+            game.make_move(None)
+        else:
+            break  # the game ended early
+    return game
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.games = random_games(5, 384)
+
+    def tearDown(self):
+        self.games = None
+
+    def testFeatures(self):
+        result = Batch.features(Batch.pack(self.games))
+        for game, row in zip(self.games, result):
+            player = game.current_player
+            own = game.bitboards[player]
+            opp = game.bitboards[1 - player]
+            self.assertEqual(row[0], Algorithms.disk_difference(game))
+            self.assertEqual(row[1], Bitboard.popcount(Bitboard.legal_moves(own, opp))
+                             - Bitboard.popcount(Bitboard.legal_moves(opp, own)))
+            self.assertEqual(row[2], Bitboard.popcount(own & Algorithms.CORNERS)
+                             - Bitboard.popcount(opp & Algorithms.CORNERS))
+        self.assertEqual(Batch.evaluate(Batch.pack(self.games)).shape, (len(self.games),))
+
+    def testFromCells(self):
+        positions = Batch.pack(self.games)
+        cells = numpy.zeros((len(self.games), 64), dtype=numpy.int8)
+        for index, game in enumerate(self.games):
+            for sq in Bitboard.iter_squares(game.bitboards[game.current_player]):
+                cells[index, sq] = 1
+            for sq in Bitboard.iter_squares(game.bitboards[1 - game.current_player]):
+                cells[index, sq] = -1
+        self.assertTrue((Batch.from_cells(cells) == positions).all())
+
+    def testExpand(self):
+        children, parents, moves, terminal = Batch.expand(Batch.pack(self.games))
+        for index, game in enumerate(self.games):
+            successors = game.successors()
+            expected = Batch.pack(successors) if successors else numpy.empty((0, 2), dtype=numpy.uint64)
+            if not successors and not terminal[index]:
+                expected = Batch.pack([Othello.Othello.from_bitboards(game.bitboards[0], game.bitboards[1],
+                                                                      1 - game.current_player)])
+                self.assertEqual(list(moves[parents == index]), [Batch.PASS_MOVE])
+            self.assertTrue((children[parents == index] == expected).all())
+        self.assertEqual(int(terminal.sum()), 5)  # every random game ends in a terminal position
+
+    def testExpandLayers(self):
+        game = Othello.Othello()
+        game.initialize_board()
+        positions = Batch.pack([game])
+        counts = []
+        for _ in range(5):
+            positions = Batch.expand(positions)[0]
+            counts.append(len(positions))
+        self.assertEqual(counts, [4, 12, 56, 244, 1396])
 
 
 def main():
@@ -0,0 +1,216 @@
+"""
+Transposition.py contains a fixed size transposition table for the search algorithms.
+
+Othello reaches the same position through many move orders. The table remembers the result
+of searching a position, keyed by the Zobrist key of the position (see Othello.key),
+so the search can reuse it instead of searching the position again.
+
+The table never grows: its size is fixed from a memory budget when it is created,
+and a new entry has to replace an old one when both map to the same slot.
+SharedTranspositionTable is the same table in shared memory, for several processes searching together.
+"""
+from array import array
+from multiprocessing import shared_memory
+
+# Bound types. EMPTY marks a slot that was never written.
+EMPTY = 0
+EXACT = 1  # the score is the exact value of the position
+LOWER = 2  # the real value is at least the score (the search failed high)
+UPPER = 3  # the real value is at most the score (the search failed low)
+
+NO_MOVE = -1
+PASS_MOVE = 64
+
+# bytes per entry: key (8), score (4), depth (1), bound (1), best move (1), age (1)
+ENTRY_SIZE = 16
+
+
+class TranspositionTable:
+    """
+    The entries are stored in parallel arrays, slot i of every array is one entry.
+    A position is stored at slot (key & mask), the full key is kept to detect collisions.
+
+    Replacement is depth preferred with aging: a new entry replaces the one in its slot
+    if the slot is empty, holds the same position, was written during an older search,
+    or was searched to a depth no deeper than the new entry.
+    """
+
+    def __init__(self, size_mb=16):
+        """
+        :param size_mb: The memory budget of the table in megabytes.
+        The number of slots is the largest power of 2 that fits in the budget.
+        """
+        slots = 1
+        while slots * 2 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            slots *= 2
+        self.size = slots
+        self.mask = slots - 1
+        self.keys = array('Q', bytes(8 * slots))
+        self.scores = array('i', bytes(4 * slots))
+        self.depths = array('b', bytes(slots))
+        self.bounds = array('B', bytes(slots))
+        self.moves = array('b', bytes(slots))
+        self.ages = array('B', bytes(slots))
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        """
+        Start a new search. Entries of older searches become the first to be replaced.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        """
+        Empty the table and reset the counters.
+        """
+        self.bounds = array('B', bytes(self.size))
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def probe(self, key):
+        """
+        Look up a position.
+        :param key: The Zobrist key of the position.
+        :return: A tuple (depth, score, bound, move), or None if the position is not in the table.
+        """
+        slot = key & self.mask
+        if self.bounds[slot] != EMPTY and self.keys[slot] == key:
+            self.hits += 1
+            return self.depths[slot], self.scores[slot], self.bounds[slot], self.moves[slot]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, bound, move=NO_MOVE):
+        """
+        Store the result of searching a position, if the replacement policy allows it.
+        :param key: The Zobrist key of the position.
+        :param depth: The depth the position was searched to.
+        :param score: The score the search returned.
+        :param bound: EXACT, LOWER or UPPER.
+        :param move: The bit index of the best move, PASS_MOVE or NO_MOVE.
+        :return: Nothing
+        """
+        slot = key & self.mask
+        if self.bounds[slot] != EMPTY and self.keys[slot] != key:
+            if self.ages[slot] == self.age and self.depths[slot] > depth:
+                return  # keep the deeper entry of the current search
+            self.overwrites += 1
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.depths[slot] = min(depth, 127)
+        self.bounds[slot] = bound
+        self.moves[slot] = move
+        self.ages[slot] = self.age
+
+    def stats(self):
+        """
+        :return: A dictionary of the hit, miss and overwrite counts.
+        """
+        return {"hits": self.hits, "misses": self.misses, "overwrites": self.overwrites}
+
+
+class SharedTranspositionTable:
+    """
+    A transposition table held in multiprocessing.shared_memory so that several processes
+    searching at the same time share their results. It has the same methods as TranspositionTable.
+
+    It is written without locks. Each slot is two 64 bit words: the entry packed into one word (data),
+    and the key XOR data in the other (check). A reader only accepts the slot if check XOR data gives back its key,
+    so a slot torn by two processes writing at the same time reads as a miss instead of a wrong entry.
+
+    The process that creates the table has to unlink() it when every process is done with it.
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        """
+        :param size_mb: The memory budget of the table in megabytes, the number of slots is a power of 2.
+        :param name: The name of an existing table to attach to, by default a new table is created.
+        """
+        slots = 1
+        while slots * 2 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            slots *= 2
+        self.size = slots
+        self.mask = slots - 1
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=slots * ENTRY_SIZE)
+            self.memory.buf[:] = bytes(slots * ENTRY_SIZE)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.words = self.memory.buf.cast('Q')
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        """
+        Start a new search. Entries of older searches become the first to be replaced.
+        Every process sharing the table should call it once per search.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        """
+        Empty the table for every process and reset the counters of this one.
+        """
+        self.memory.buf[:] = bytes(self.size * ENTRY_SIZE)
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def probe(self, key):
+        """
+        Look up a position.
+        :param key: The Zobrist key of the position.
+        :return: A tuple (depth, score, bound, move), or None if the position is not in the table.
+        """
+        slot = (key & self.mask) * 2
+        data = self.words[slot + 1]
+        if self.words[slot] ^ data == key and (data >> 40) & 0xFF != EMPTY:
+            self.hits += 1
+            return (data >> 32) & 0xFF, (data & 0xFFFFFFFF) - 0x80000000, (data >> 40) & 0xFF, ((data >> 48) & 0xFF) - 1
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, bound, move=NO_MOVE):
+        """
+        Store the result of searching a position, if the replacement policy allows it.
+        The arguments are the same as TranspositionTable.store.
+        :return: Nothing
+        """
+        slot = (key & self.mask) * 2
+        old = self.words[slot + 1]
+        if (old >> 40) & 0xFF != EMPTY and self.words[slot] ^ old != key:
+            if old >> 56 == self.age and (old >> 32) & 0xFF > depth:
+                return  # keep the deeper entry of the current search
+            self.overwrites += 1
+        data = ((score + 0x80000000) | min(max(depth, 0), 127) << 32 | bound << 40
+                | (move + 1) << 48 | self.age << 56)
+        self.words[slot + 1] = data
+        self.words[slot] = key ^ data
+
+    def stats(self):
+        """
+        :return: A dictionary of the hit, miss and overwrite counts of this process.
+        """
+        return {"hits": self.hits, "misses": self.misses, "overwrites": self.overwrites}
+
+    def close(self):
+        """
+        Detach this process from the table.
+        """
+        self.words.release()
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Free the shared memory of the table, once every process has closed it.
+        """
+        self.memory.unlink()